@@ -1,15 +1,21 @@
 import bpy
 import bmesh
-import math
 import mathutils
+import numpy as np
 
 from . import interpolate
 
 
 class Loop():
-    def __init__(self, bm, edges):
+    def __init__(self, bm, topology, indices):
+        '''
+        :param topology: util.Topology of bm
+        :param indices: edge indices of the loop, in order
+        '''
         self.bm = bm
-        self.edges = edges
+        self.topology = topology
+        self.indices = indices
+        self.edges = [topology.edges[e] for e in indices]
 
         self.verts = set()
         for e in self.edges:
@@ -19,12 +25,14 @@ class Loop():
         # print("edgeloop length: %s" % len(self.edges))
         self.valences = []
 
+        # rings and edge rings are keyed by edge index
         self.ring = {}
-        for e in self.edges:
+        for e in self.indices:
             self.ring[e] = []
 
         self.edge_rings = {}
         self.ends = {}
+        self.flow_indices = None
 
     def __str__(self):
         str = "\n"
@@ -32,8 +40,8 @@ class Loop():
             str += "edge: %s -" % (edge.index)
             str += " valence: %s" % self.valences[index]
 
-            for r in self.get_ring(edge):
-                str += " | %s " % r.index
+            for r in self.get_ring(edge.index):
+                str += " | %s " % r
 
             # print(self.edge_ring.values())
             # for k,v in self.edge_ring.items():
@@ -45,7 +53,7 @@ class Loop():
             #    str += " = %s " % loop.edge.index
             str += "\n"
 
-            ends = self.get_ring_ends(edge)
+            ends = self.get_ring_ends(edge.index)
             for e in ends:
                 str += " end: %s" % e.index
 
@@ -201,129 +209,108 @@ class Loop():
 
             last_vert = vert
 
-    def set_flow(self, tension, min_angle):
+    def get_flow_indices(self):
+        '''
+        Gathers the control points of every vertex set_flow moves in one
+        topology pass. Each row holds vertex indices:
+        center, p1, p2, p3 (as seen from p1), p3, p4
+        p1 / p4 are -1 where the ring ends at a boundary and the point
+        has to be extrapolated.
+        '''
+        if self.flow_indices is not None:
+            return self.flow_indices
+
+        t = self.topology
         visited = set()
-
-        for edge in self.edges:
-            target = {}
-
-            if edge.is_boundary:
+        rows = []
+        for edge in self.indices:
+            if t.is_boundary(edge):
                 continue
 
-            for loop in edge.link_loops:
+            for loop in t.edge_loops[edge]:
                 if loop in visited:
                     continue
 
                 # todo check triangles/ngons?
 
                 visited.add(loop)
-                ring1 = loop.link_loop_next.link_loop_next
-                ring2 = loop.link_loop_radial_prev.link_loop_prev.link_loop_prev
-
-                center = edge.other_vert(loop.vert)
-
-                p1 = None
-                p2 = ring1.vert
-                p3 = ring2.link_loop_radial_next.vert
-                p4 = None
-
-                print("ring1 %s - %s" % (ring1.vert.index, ring1.edge.index))
-                print("ring2 %s - %s" % (ring2.vert.index, ring2.edge.index))
-                # print("p2: %s - p3: %s " % (p2.index, p3.index))
-
-                result = []
-                if not ring1.edge.is_boundary:
-                    is_quad = len(ring1.face.verts) == 4
-                    # if is_quad:
-                    final = ring1.link_loop_radial_next.link_loop_next
-
-                    # else:
-                    #    final = ring1
-
-                    print("is_quad:", is_quad, " - ", final.edge.index)
-
-                    a, b = final.edge.verts
-                    if p2 == a:
-                        p1 = b.co
-                    else:
-                        p1 = a.co
-
-                    a = (p1 - p2.co).normalized()
-                    b = (center.co - p2.co).normalized()
-                    dot = min(1.0, max(-1.0, a.dot(b)))
-                    angle = math.acos(dot)
-
-                    if angle < min_angle:
-                        # print("r1: %s" % (math.degrees(angle)))
-                        p1 = p2.co - (p3.co - p2.co) * 0.5
-
-                        # bmesh.ops.create_vert(self.bm, co=p1)
-
+                ring1 = t.loop_next[t.loop_next[loop]]
+                ring2 = t.loop_prev[t.loop_prev[t.loop_radial_prev[loop]]]
+
+                center = t.other_vert(edge, t.loop_vert[loop])
+                p2 = t.loop_vert[ring1]
+                p3 = t.loop_vert[t.loop_radial_next[ring2]]
+                p3_ring1 = p3
+
+                p1 = -1
+                if not t.is_boundary(t.loop_edge[ring1]):
+                    final = t.loop_next[t.loop_radial_next[ring1]]
+                    p1 = t.other_vert(t.loop_edge[final], p2)
+
+                p4 = -1
+                if not t.is_boundary(t.loop_edge[ring2]):
+                    final = t.loop_prev[t.loop_radial_prev[ring2]]
+                    p4 = t.other_vert(t.loop_edge[final], p3)
                 else:
-                    p1 = p2.co - (p3.co - p2.co)
-                    # bmesh.ops.create_vert(self.bm, co=p1)
-
-                result.append(p1)
-                result.append(p2.co)
-
-                if not ring2.edge.is_boundary:
-                    is_quad = len(ring2.face.verts) == 4
-                    # if is_quad:
-                    final = ring2.link_loop_radial_prev.link_loop_prev
-                    # else:
-                    #    final = ring2
-
-                    print("is_quad:", is_quad, " - ", final.edge.index)
+                    # radial_next doenst work at boundary
+                    p3 = t.other_vert(t.loop_edge[ring2], p3)
 
-                    a, b = final.edge.verts
+                rows.append((center, p1, p2, p3_ring1, p3, p4))
 
-                    if p3 == a:
-                        p4 = b.co
-                    else:
-                        p4 = a.co
+        self.flow_indices = np.array(rows, dtype=np.int64).reshape(-1, 6)
+        return self.flow_indices
 
-                    a = (p4 - p3.co).normalized()
-                    b = (center.co - p3.co).normalized()
-                    dot = min(1.0, max(-1.0, a.dot(b)))
-                    angle = math.acos(dot)
+    def set_flow(self, co, tension, min_angle):
+        '''
+        Moves the loop vertices onto the curve through their edge ring,
+        for all of them at once.
 
-                    if angle < min_angle:
-                        # print("r2: %s" % (math.degrees(angle)))
-                        p4 = p3.co - (p2.co - p3.co) * 0.5
+        :param co: (n, 3) numpy array of vertex coordinates, modified in place
+        '''
+        indices = self.get_flow_indices()
+        if not len(indices):
+            return
 
-                        # bmesh.ops.create_vert(self.bm, co=p4)
+        center, i1, i2, i3_ring1, i3, i4 = indices.T
+        c = co[center]
+        p2 = co[i2]
+        p3 = co[i3]
+        p3_ring1 = co[i3_ring1]
 
-                else:
-                    # radial_next doenst work at boundary
-                    p3 = ring2.edge.other_vert(p3)
-                    p4 = p3.co - (p2.co - p3.co)
-                    # bmesh.ops.create_vert(self.bm, co=p4)
+        has_p1 = (i1 >= 0)[:, None]
+        p1 = np.where(has_p1, co[i1], p2 - (p3_ring1 - p2))
+        if min_angle > 0:
+            sharp = has_p1[:, 0] & (angle_between(p1 - p2, c - p2) < min_angle)
+            p1[sharp] = p2[sharp] - (p3_ring1[sharp] - p2[sharp]) * 0.5
 
-                result.append(p3.co)
-                result.append(p4)
+        has_p4 = (i4 >= 0)[:, None]
+        p4 = np.where(has_p4, co[i4], p3 - (p2 - p3))
+        if min_angle > 0:
+            sharp = has_p4[:, 0] & (angle_between(p4 - p3, c - p3) < min_angle)
+            p4[sharp] = p3[sharp] - (p2[sharp] - p3[sharp]) * 0.5
 
-                target[center] = result
+        # two identical control points is invalid input, leave those as is
+        valid = ~((p1 == p2).all(axis=1) | (p3 == p4).all(axis=1))
 
-            for vert, points in target.items():
-                p1, p2, p3, p4 = points
+        # normalize point distances so that long edges dont skew the curve
+        d = np.linalg.norm(p2 - p3, axis=1)[:, None] * 0.5
 
-                if p1 == p2 or p3 == p4:
-                    print("invalid input - two control points are identical!")
-                    continue
+        p1 = p2 + d * normalized(p1 - p2)
+        p4 = p3 + d * normalized(p4 - p3)
 
-                # normalize point distances so that long edges dont skew the curve
-                d = (p2 - p3).length * 0.5
+        result = interpolate.hermite_3d_array(p1, p2, p3, p4, 0.5, -tension, 0)
+        co[center[valid]] = result[valid]
 
-                p1 = p2 + (d * (p1 - p2).normalized())
-                p4 = p3 + (d * (p4 - p3).normalized())
 
-                # print("p1: %s\np2:%s\np3: %s\np4:%s\n1" % (p1, p2, p3, p4))
-                # result = mathutils.geometry.interpolate_bezier(p1, p2, p3, p4, 3)[1]
+def normalized(v):
+    '''
+    Row wise normalize of a (n, 3) array, zero length rows stay zero
+    like mathutils.Vector.normalized
+    '''
+    length = np.linalg.norm(v, axis=1)[:, None]
+    return np.divide(v, length, out=np.zeros_like(v), where=length > 0)
 
-                # result = interpolate.catmullrom(p1, p2, p3, p4, 1, 3)[1]
-                result = interpolate.hermite_3d(p1, p2, p3, p4, 0.5, -tension, 0)
-                result = mathutils.Vector(result)
-                linear = (p2 + p3) * 0.5
 
-                vert.co = result
-                # vert.co = linear.lerp(curved, tension)
+def angle_between(a, b):
+    dot = (normalized(a) * normalized(b)).sum(axis=1)
+    return np.arccos(np.clip(dot, -1.0, 1.0))
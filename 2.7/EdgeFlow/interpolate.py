@@ -78,3 +78,14 @@ def hermite_3d(p1, p2, p3, p4, mu, tension, bias):
     z = hermite_1d(p1[2], p2[2], p3[2], p4[2], mu, tension, bias)
 
     return [x, y, z]
+
+
+def hermite_3d_array(p1, p2, p3, p4, mu, tension, bias):
+    '''
+    Same as hermite_3d, but for many curves at once.
+    p1 to p4 are (n, 3) numpy arrays, the arithmetic in hermite_1d
+    works element wise on them.
+
+    :return: numpy array (n, 3)
+    '''
+    return hermite_1d(p1, p2, p3, p4, mu, tension, bias)
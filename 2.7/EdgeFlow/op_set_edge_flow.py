@@ -1,4 +1,5 @@
 import math
+import numpy as np
 import bpy
 from bpy.props import IntProperty, FloatProperty, EnumProperty
 import bmesh
@@ -12,6 +13,7 @@ class SetEdgeLoopBase():
         bm.from_mesh(obj.data)
         bm.normal_update()
         bm.verts.ensure_lookup_table()
+        bm.verts.index_update()
         return bm
 
     def revert(self):
@@ -50,7 +52,9 @@ class SetEdgeLoopBase():
                     p = p.freeze()
                     self.vert_positions[v] = p
 
-        self.edgeloops = util.get_edgeloops(self.bm, self.edges)
+        self.topology = util.Topology(self.bm)
+        self.edgeloops = util.get_edgeloops(self.bm, self.edges, self.topology)
+        self.vert_coords = util.get_vert_coords(self.obj.data)
 
         return {'PASS_THROUGH'}
 
@@ -73,13 +77,16 @@ class SetEdgeFlowOP(bpy.types.Operator, SetEdgeLoopBase):
         #print ("execute")
         bpy.ops.object.mode_set(mode='OBJECT')
 
-        self.revert()
+        # work on a copy of the rest positions, this also reverts
+        co = self.vert_coords.copy()
 
         for i in range(self.iterations):
             for edgeloop in self.edgeloops:
-                edgeloop.set_flow(self.tension / 100.0, math.radians(self.min_angle) )
+                edgeloop.set_flow(co, self.tension / 100.0, math.radians(self.min_angle) )
 
-        self.bm.to_mesh(self.obj.data)
+        mesh = self.obj.data
+        mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+        mesh.update()
         bpy.ops.object.mode_set(mode='EDIT')
 
         return {'FINISHED'}
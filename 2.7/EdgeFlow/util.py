@@ -1,78 +1,141 @@
-from collections import deque
+from collections import defaultdict, deque
 
 import bpy
 import bmesh
+import numpy as np
 
 from . import edgeloop
 
 
-def walk_boundary(start_edge, limit_to_edges=None):
-    edge_loop = set([start_edge])
-    visited = set()
-
-    candidates = [start_edge]
-    while True:
-        for candidate in candidates:
-            for vert in candidate.verts:
-                if len(vert.link_edges) > 2:  # valence of verts as a blocker
-                    for edge in vert.link_edges:
-                        if edge.is_boundary and edge not in edge_loop:
-                            if limit_to_edges != None:
-                                if edge in limit_to_edges:
-                                    edge_loop.add(edge)
-                            else:
-                                edge_loop.add(edge)
-
-            visited.add(candidate)
+def get_vert_coords(mesh):
+    '''
+    :return: (n, 3) float64 numpy array of the mesh vertex coordinates
+    '''
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3).astype(np.float64)
 
-        candidates = edge_loop - visited
-        if len(visited) == len(edge_loop):
-            break
 
-    #sorting this mess..
-    raw_edge_loop = list(edge_loop)
+class Topology():
+    '''
+    Integer indexed connectivity of a BMesh, gathered in one pass so the
+    edge loop passes below do list lookups instead of BMesh attribute access.
+    Verts, edges and faces use their element index, loops are numbered face
+    by face.
+    '''
+    def __init__(self, bm):
+        bm.verts.index_update()
+        bm.edges.index_update()
+        bm.faces.index_update()
+
+        self.edges = list(bm.edges)
+        self.edge_verts = [(e.verts[0].index, e.verts[1].index) for e in self.edges]
+        self.vert_valence = [len(v.link_edges) for v in bm.verts]
+
+        self.loops = []
+        self.loop_vert = []
+        self.loop_edge = []
+        self.loop_face = []
+        self.loop_next = []
+        self.loop_prev = []
+        self.face_valence = []
+
+        loop_ids = {}
+        for face in bm.faces:
+            start = len(self.loops)
+            count = len(face.loops)
+            self.face_valence.append(count)
+
+            for i, loop in enumerate(face.loops):
+                loop_ids[loop] = start + i
+                self.loops.append(loop)
+                self.loop_vert.append(loop.vert.index)
+                self.loop_edge.append(loop.edge.index)
+                self.loop_face.append(face.index)
+                self.loop_next.append(start + (i + 1) % count)
+                self.loop_prev.append(start + (i - 1) % count)
+
+        # link_loops follows the radial cycle
+        self.edge_loops = []
+        self.loop_radial_next = [0] * len(self.loops)
+        self.loop_radial_prev = [0] * len(self.loops)
+        for edge in self.edges:
+            loops = tuple(loop_ids[l] for l in edge.link_loops)
+            self.edge_loops.append(loops)
+
+            count = len(loops)
+            for i, l in enumerate(loops):
+                self.loop_radial_next[l] = loops[(i + 1) % count]
+                self.loop_radial_prev[l] = loops[i - 1]
+
+    def is_boundary(self, edge):
+        return len(self.edge_loops[edge]) == 1
+
+    def other_vert(self, edge, vert):
+        a, b = self.edge_verts[edge]
+        return b if vert == a else a
+
+
+def build_boundary_map(topology, edges):
+    '''
+    :return: dict of vert -> boundary edges among edges linked to it
+    '''
+    boundary_map = defaultdict(list)
+    for edge in edges:
+        if topology.is_boundary(edge):
+            for vert in topology.edge_verts[edge]:
+                boundary_map[vert].append(edge)
+    return boundary_map
 
-    start_edge = raw_edge_loop[0]
-    raw_edge_loop.remove(start_edge)
 
-    sorted_edge_loop = deque()
-    sorted_edge_loop.append(start_edge)
-    add = sorted_edge_loop .append
+def walk_boundary(topology, start_edge, limit_to_edges=None, boundary_map=None):
+    '''
+    Chains boundary edges from start_edge in both directions, stopping at
+    verts with a valence of 2 or less (corners).
+    boundary_map has to contain every edge the walk may reach, by default
+    it is built for the whole mesh.
+    '''
+    t = topology
+    if boundary_map is None:
+        boundary_map = build_boundary_map(t, range(len(t.edges)))
 
-    for p in start_edge.verts:
-        while True:
+    edge_loop = deque()
+    edge_loop.append(start_edge)
+    visited = {start_edge}
+    add = edge_loop.append
 
+    for p in t.edge_verts[start_edge]:
+        while t.vert_valence[p] > 2:  # valence of verts as a blocker
             edge = None
-            for e in raw_edge_loop:
-                if p in e.verts:
-                    edge = e
-
-            if edge != None:
-                add(edge)
-                p = edge.other_vert(p)
-                raw_edge_loop.remove(edge)
-            else:
+            for e in boundary_map.get(p, ()):
+                if e in visited:
+                    continue
+                if limit_to_edges != None and e not in limit_to_edges:
+                    continue
+                edge = e
                 break
 
-        add = sorted_edge_loop .appendleft
+            if edge is None:
+                break
 
-    #for e in list(sorted_edge_loop ):
-    #    print("###", e.index)
+            visited.add(edge)
+            add(edge)
+            p = t.other_vert(edge, p)
 
-    if len(sorted_edge_loop ) != len(edge_loop):
-        raise  Exception("WTF")
+        add = edge_loop.appendleft
 
-    return list(sorted_edge_loop)
+    return list(edge_loop)
 
 
-def walk_ngon(start_edge, limit_to_edges=None):
+def walk_ngon(topology, start_edge, limit_to_edges=None):
+    t = topology
     edge_loop = deque()
     edge_loop.append(start_edge)
 
     start_loops = []
     face_valence = []
-    for linked_loop in start_edge.link_loops:
-        vert_count = len(linked_loop.face.verts)
+    for linked_loop in t.edge_loops[start_edge]:
+        vert_count = t.face_valence[t.loop_face[linked_loop]]
         if vert_count > 4:
             start_loops.append(linked_loop)
             face_valence.append(vert_count)
@@ -80,176 +143,160 @@ def walk_ngon(start_edge, limit_to_edges=None):
     max_value = max(face_valence)
     start_loop = start_loops[face_valence.index(max_value)]
 
-    # print(start_loop.vert.index, start_loop.edge.index)
-
-    loop = start_loop.link_loop_next
-    while len(loop.vert.link_edges) < 4 and loop.edge not in edge_loop:
-        if limit_to_edges != None and loop.edge not in limit_to_edges:
+    loop = t.loop_next[start_loop]
+    while t.vert_valence[t.loop_vert[loop]] < 4 and t.loop_edge[loop] not in edge_loop:
+        if limit_to_edges != None and t.loop_edge[loop] not in limit_to_edges:
             break
 
-        edge_loop.append(loop.edge)
-        # print("next", loop.edge.index)
-        loop = loop.link_loop_next
+        edge_loop.append(t.loop_edge[loop])
+        loop = t.loop_next[loop]
 
-    # print("switch")
-    loop = start_loop.link_loop_prev
-    while len(loop.edge.other_vert(loop.vert).link_edges) < 4 and loop.edge not in edge_loop:
-        if limit_to_edges != None and loop.edge not in limit_to_edges:
+    loop = t.loop_prev[start_loop]
+    while (t.vert_valence[t.other_vert(t.loop_edge[loop], t.loop_vert[loop])] < 4 and
+           t.loop_edge[loop] not in edge_loop):
+        if limit_to_edges != None and t.loop_edge[loop] not in limit_to_edges:
             break
 
-        edge_loop.appendleft(loop.edge)
-        loop = loop.link_loop_prev
-        # print("prev", loop.edge.index)
+        edge_loop.appendleft(t.loop_edge[loop])
+        loop = t.loop_prev[loop]
 
     return list(edge_loop)
 
 
-def walk_edge_loop(start_edge, limit_to_edges=None):
+def walk_edge_loop(topology, start_edge, limit_to_edges=None):
+    t = topology
     edge_loop = deque()
     edge_loop.append(start_edge)
     add = edge_loop.append
 
-    for loop in start_edge.link_loops:
-        start_valence = len(loop.vert.link_edges)
-        # print("start_valence", start_valence)
+    for loop in t.edge_loops[start_edge]:
+        start_valence = t.vert_valence[t.loop_vert[loop]]
 
         if start_valence <= 4:
             while True:
-                valence = len(loop.vert.link_edges)
-                # print("valence: %s | vert: %s edge: %s" % (valence, loop.vert.index, loop.edge.index))
+                valence = t.vert_valence[t.loop_vert[loop]]
 
                 if valence == 4 and start_valence == valence:
-                    loop = loop.link_loop_prev.link_loop_radial_prev.link_loop_prev
-
-                    if limit_to_edges != None:
-                        if loop.edge in limit_to_edges:
-                            add(loop.edge)
-                        else:
-                            break
-                    else:
-                        add(loop.edge)
+                    loop = t.loop_prev[t.loop_radial_prev[t.loop_prev[loop]]]
+                    edge = t.loop_edge[loop]
 
-                        # print("add edge:", loop.edge.index)
+                    if limit_to_edges != None and edge not in limit_to_edges:
+                        break
+                    add(edge)
                 else:
-                    # print("break valence", valence, loop.face != face)
                     break
-        else:
-            pass
-            # print("ignore this direction")
         add = edge_loop.appendleft
 
     return list(edge_loop)
 
 
-def get_edgeloop(bm, start_edge, limit_to_edges=None):
-    start_loops = start_edge.link_loops
+def get_edgeloop(bm, topology, start_edge, limit_to_edges=None, boundary_map=None):
+    t = topology
 
     is_ngon = False
-    for loop in start_loops:
-        if len(loop.face.verts) > 4:
+    for loop in t.edge_loops[start_edge]:
+        if t.face_valence[t.loop_face[loop]] > 4:
             is_ngon = True
             break
 
-    quad_flow = len(start_edge.verts[0].link_edges) == 4 and len(start_edge.verts[1].link_edges) == 4
-    loop_end = (len(start_edge.verts[0].link_edges) > 4 and len(start_edge.verts[1].link_edges) == 4 or
-                len(start_edge.verts[0].link_edges) == 4 and len(start_edge.verts[1].link_edges) > 4)
-
-    # print( "is quad flow", quad_flow)
-    # print("is loop end", loop_end)
+    a, b = t.edge_verts[start_edge]
+    valence_a = t.vert_valence[a]
+    valence_b = t.vert_valence[b]
+    quad_flow = valence_a == 4 and valence_b == 4
+    loop_end = (valence_a > 4 and valence_b == 4 or
+                valence_a == 4 and valence_b > 4)
 
     if is_ngon and not quad_flow and not loop_end:
-        return edgeloop.Loop(bm, walk_ngon(start_edge, limit_to_edges))
-
-    elif start_edge.is_boundary:
-        return edgeloop.Loop(bm, walk_boundary(start_edge, limit_to_edges))
+        edges = walk_ngon(t, start_edge, limit_to_edges)
+    elif t.is_boundary(start_edge):
+        edges = walk_boundary(t, start_edge, limit_to_edges, boundary_map)
     else:
-        return edgeloop.Loop(bm, walk_edge_loop(start_edge, limit_to_edges))
-
+        edges = walk_edge_loop(t, start_edge, limit_to_edges)
 
-def get_edgeloops(bm, edges):
-    '''
-    edge_loop = get_edgeloop(edges[0])
+    return edgeloop.Loop(bm, t, edges)
 
-    for e in edge_loop:
-        e.select = True
 
-    return
+def get_edgeloops(bm, edges, topology=None):
+    '''
+    :param topology: Topology of bm, built here if not given
     '''
+    if topology is None:
+        topology = Topology(bm)
 
+    edges = [e.index for e in edges]
     not_visited = set(edges)
+    # boundary walks are limited to the selection, so it's all they need
+    boundary_map = build_boundary_map(topology, edges)
 
     edge_loops = []
     while (len(not_visited) > 0):
         next = not_visited.pop()
 
-        edge_loop = get_edgeloop(bm, next, not_visited)
+        edge_loop = get_edgeloop(bm, topology, next, not_visited, boundary_map)
         edge_loops.append(edge_loop)
 
-        for edge in edge_loop.edges:
-            if edge in not_visited:
-                not_visited.remove(edge)
+        for edge in edge_loop.indices:
+            not_visited.discard(edge)
 
     print("edge_loops:", len(edge_loops))
 
-    edge_loops = compute_edgeloop_data(edge_loops)
+    edge_loops = compute_edgeloop_data(edge_loops, topology)
     return edge_loops
 
 
-def find_edge_ring_neighbours(edgeloops, edge_to_Edgeloop):
+def find_edge_ring_neighbours(edgeloops, edge_to_Edgeloop, topology):
+    t = topology
     # find neighbouring edge rings
     for edgeloop in edgeloops:
-        for edge in edgeloop.edges:
-
-            if len(edgeloop.get_ring(edge)) == 2:
+        for edge in edgeloop.indices:
+            ring = edgeloop.get_ring(edge)
+            if len(ring) == 2:
                 continue
 
-            for link_loop in edge.link_loops:
-                if len(link_loop.face.verts) != 4:
+            for link_loop in t.edge_loops[edge]:
+                if t.face_valence[t.loop_face[link_loop]] != 4:
                     continue
 
-                next = link_loop.link_loop_next.link_loop_next.edge
+                next = t.loop_edge[t.loop_next[t.loop_next[link_loop]]]
 
-                if next not in edgeloop.get_ring(edge):
-                    if next in edge_to_Edgeloop.keys():
+                if next not in ring:
+                    next_edgeloop = edge_to_Edgeloop[next]
+                    if next_edgeloop is not None:
                         edgeloop.set_ring(edge, next)
-                        edge_to_Edgeloop[next].set_ring(next, edge)
+                        next_edgeloop.set_ring(next, edge)
 
 
-def find_control_edgeloop(edgeloops, edge_to_Edgeloop):
+def find_control_edgeloop(edgeloops, edge_to_Edgeloop, topology):
+    t = topology
     for edgeloop in edgeloops:
-        for edge in edgeloop.edges:
+        for edge in edgeloop.indices:
             if edge in edgeloop.edge_rings:
                 continue
 
-            #print("start edge: ", edge.index)
-
             edge_ring = deque()
-            edge_ring.append(edge.link_loops[0])
+            edge_ring.append(t.edge_loops[edge][0])
             ends = []
             append_func = edge_ring.append
 
-            for index, loop in enumerate(edge.link_loops):
+            for index, loop in enumerate(t.edge_loops[edge]):
                 next = loop
-                prev = None
                 visited = set()
                 while True:
 
-                    ring = next.link_loop_prev.link_loop_prev
-                    #print(ring.edge.index)
+                    ring = t.loop_prev[t.loop_prev[next]]
                     if ring in visited:
                         break
                     visited.add(ring)
 
-                    if ring.edge not in edge_to_Edgeloop:
+                    ring_edge = t.loop_edge[ring]
+                    if edge_to_Edgeloop[ring_edge] is None:
                         ends.append(ring)
                         break
 
-                    # print( ring.edge.index )
                     append_func(ring)
-                    prev = next
-                    next = ring.link_loop_radial_prev
+                    next = t.loop_radial_prev[ring]
 
-                    if ring.edge.is_boundary:
+                    if t.is_boundary(ring_edge):
                         ends.append(ring)
                         break
 
@@ -257,20 +304,18 @@ def find_control_edgeloop(edgeloops, edge_to_Edgeloop):
                 if index == 0:
                     append_func = edge_ring.appendleft
 
-
-            #print("edge_ring:")
-            #for l in edge_ring:
-            #    print(l.edge.index)
+            ring_loops = deque(t.loops[ring] for ring in edge_ring)
+            ends = [t.loops[ring] for ring in ends]
             for ring in edge_ring:
-                edge_to_Edgeloop[ring.edge].edge_rings[ring.edge] = edge_ring
-                edge_to_Edgeloop[ring.edge].ends[ring.edge] = ends
-            #edgeloop.edge_rings[ring] = edge_ring
+                ring_edge = t.loop_edge[ring]
+                edge_to_Edgeloop[ring_edge].edge_rings[ring_edge] = ring_loops
+                edge_to_Edgeloop[ring_edge].ends[ring_edge] = ends
 
 
 def compute_edge_ring_valences(edgeloops, edge_to_Edgeloop):
     for edgeloop in edgeloops:
         max_valence = -1
-        for edge in edgeloop.edges:
+        for edge in edgeloop.indices:
             valence = 0
             visited = set()
             search = set()
@@ -295,17 +340,18 @@ def compute_edge_ring_valences(edgeloops, edge_to_Edgeloop):
         edgeloop.max_valence = max_valence
 
 
-def compute_edgeloop_data(edgeloops):
-    edge_to_Edgeloop = {}
+def compute_edgeloop_data(edgeloops, topology):
+    # edge index -> Loop, None for edges outside the selection
+    edge_to_Edgeloop = [None] * len(topology.edges)
 
     for edgeloop in edgeloops:
-        for edge in edgeloop.edges:
+        for edge in edgeloop.indices:
             edge_to_Edgeloop[edge] = edgeloop
 
-    find_edge_ring_neighbours(edgeloops, edge_to_Edgeloop)
+    find_edge_ring_neighbours(edgeloops, edge_to_Edgeloop, topology)
     compute_edge_ring_valences(edgeloops, edge_to_Edgeloop)
 
-    find_control_edgeloop(edgeloops, edge_to_Edgeloop)
+    find_control_edgeloop(edgeloops, edge_to_Edgeloop, topology)
 
     result = sorted(edgeloops, key=lambda edgeloop: edgeloop.max_valence)
     result = list(reversed(result))
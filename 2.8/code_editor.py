@@ -22,7 +22,9 @@ import blf
 from gpu_extras.batch import batch_for_shader
 from bpy.types import Operator
 from collections import defaultdict, deque
-from itertools import repeat
+from bisect import bisect_right
+from itertools import accumulate, chain, repeat
+from operator import ne
 
 
 bl_info = {
@@ -58,10 +60,52 @@ void main() {
 """
 
 
+# minimap shader. positions are (column, line) and placed with
+# uniforms, so scrolling doesn't require new geometry
+sh_mm_vert = """
+uniform mat4 ModelViewProjectionMatrix;
+uniform vec4 xform;  // x offset, char width, y offset, line height
+in vec2 pos;
+in vec4 color;
+out vec4 vcolor;
+out float xpos;
+
+void main() {
+    xpos = xform.x + pos.x * xform.y;
+    vcolor = color;
+    gl_Position = ModelViewProjectionMatrix * vec4(
+        xpos, xform.z - pos.y * xform.w, 0.0, 1.0);
+}
+"""
+
+sh_mm_frag = """
+uniform float xmax;
+uniform float opacity;
+in vec4 vcolor;
+in float xpos;
+out vec4 final_color;
+
+void main() {
+    if (xpos > xmax) {
+        discard;
+    }
+    final_color = vec4(vcolor.rgb, vcolor.a * opacity);
+}
+"""
+
+
 sh_2d = gpu.types.GPUShader(sh_2d_vert, sh_2d_frag)
 sh_2d_uniform_float = sh_2d.uniform_float
 sh_2d_bind = sh_2d.bind
 
+sh_mm = gpu.types.GPUShader(sh_mm_vert, sh_mm_frag)
+sh_mm_uniform_float = sh_mm.uniform_float
+sh_mm_bind = sh_mm.bind
+
+mm_format = gpu.types.GPUVertFormat()
+mm_format.attr_add(id="pos", comp_type='F32', len=2, fetch_mode='FLOAT')
+mm_format.attr_add(id="color", comp_type='F32', len=4, fetch_mode='FLOAT')
+
 
 if bpy.app.version < (4, 0):
     blf_size = blf.size
@@ -105,6 +149,18 @@ class DefaultInt(defaultdict):
         return self._get(i)
 
 
+# find the region that differs between two hash lists by their common
+# prefix and suffix. returns (start, old end, new end) or None if equal
+def diff_range(old, new):
+    if old == new:
+        return None
+    lim = min(len(old), len(new))
+    pre = [*map(ne, old, new), True].index(True)
+    rdiff = map(ne, reversed(old[pre:]), reversed(new[pre:]))
+    suf = min([*rdiff, True].index(True), lim - pre)
+    return pre, len(old) - suf, len(new) - suf
+
+
 class TextCache(dict):
     def __missing__(self, key):  # generate a blank cache
         text = bpy.data.texts.get(key, self.ce.wrap_text)
@@ -115,10 +171,11 @@ class TextCache(dict):
             return [[] for _ in repeat(None, len(text.lines))]
         data = defaultdict(defaultlist)
         indents = DefaultInt()
-        cache = self[key] = (hashes,   # body hashes
-                             data,     # syntax data
-                             [],       # ????
-                             indents)  # indents data
+        cache = self[key] = (hashes,           # body hashes
+                             data,             # syntax data
+                             [],               # ????
+                             indents,          # indents data
+                             MLStateCache())   # multi-line string states
         return cache
 
     def purge_unused(self):
@@ -127,80 +184,124 @@ class TextCache(dict):
                 del self[k]
 
 
-class WrapText:
-    __slots__ = ('ce', 'name', 'lines', 'cmax', 'hashes')
+# word wrap breaks of a text at a given width. only lines whose hash
+# changed are rewrapped
+class WrapLayout:
+    __slots__ = ('char_max', 'text_hash', 'hashes', 'spans', 'offsets',
+                 'lines')
 
-    class WrapTextLine:
-        __slots__ = ('body', 'is_sub', 'oidx')
+    class WrapLine:
+        __slots__ = ('body', 'start', 'is_sub')
 
-        def __init__(self, body, oidx, is_sub=False):
+        def __init__(self, body, start, is_sub=False):
             self.body = body
+            self.start = start  # character offset in the original line
             self.is_sub = is_sub
-            self.oidx = oidx
+
+    def __init__(self, char_max):
+        self.char_max = char_max
+        self.text_hash = None
+        self.hashes = []    # body hash per original line
+        self.spans = []     # wrapped lines per original line
+        self.offsets = [0]  # first wrapped index per original line
+        self.lines = []     # flat wrapped lines
+
+    # original line index of a wrapped line
+    def to_source(self, widx):
+        return bisect_right(self.offsets, widx) - 1
+
+    # first wrapped line index of an original line
+    def to_wrapped(self, oidx):
+        return self.offsets[oidx]
+
+    def wrap_line(self, body):
+        wl = self.WrapLine
+        cmax = self.char_max
+        if len(body) < cmax:
+            return [wl(body, 0)]
+
+        span = []
+        append = span.append
+        pos = start = 0
+        end = cmax
+        for c in body:
+            if pos - start >= cmax:
+                append(wl(body[start:end], start, start > cmax))
+                start = end
+                end += cmax
+            elif c == " " or c == "-":
+                end = pos + 1
+            pos += 1
+        append(wl(body[start:], start, True))
+        return span
+
+    def update(self, text):
+        string = text.as_string()
+        text_hash = hash(string)
+        if text_hash == self.text_hash:
+            return
+        self.text_hash = text_hash
+        bodies = string.split("\n")
+        hashes = [*map(hash, bodies)]
+        changed = diff_range(self.hashes, hashes)
+        if changed is None:
+            return
+        self.hashes = hashes
+        pre, oend, nend = changed
+
+        wrap_line = self.wrap_line
+        spans, offsets = self.spans, self.offsets
+        new = [wrap_line(body) for body in bodies[pre:nend]]
+        self.lines[offsets[pre]:offsets[oend]] = chain.from_iterable(new)
+        spans[pre:oend] = new
+        offsets[pre:] = accumulate(map(len, spans[pre:]), initial=offsets[pre])
+
+
+wrap_layouts = {}
+
+# code editor is the only add-on building layouts. other add-ons drawing
+# in the text editor read them through get_wrap_layout, published in
+# driver_namespace with this version. they use lines, spans, offsets and
+# to_source, bump the version when any of those change
+WRAP_LAYOUT_VERSION = 1
+
+
+def get_wrap_layout(text, char_max):
+    layouts = wrap_layouts
+    key = text.name, char_max
+    layout = layouts.get(key)
+    if layout is None:
+        if len(layouts) >= 16:  # drop the oldest
+            del layouts[next(iter(layouts))]
+        layout = layouts[key] = WrapLayout(char_max)
+    layout.update(text)
+    return layout
+
+
+# per-editor handle on the shared wrap layout of its text
+class WrapText:
+    __slots__ = ('ce', 'name', 'layout')
 
     def __init__(self, text, ce):
         self.ce = ce
         self.name = text.name
-        self.lines = []
-        self.cmax = ce.cmax
-        self.rebuild_lines()
+        self.layout = get_wrap_layout(text, max(8, ce.cmax))
 
     def check_hash(self):
         otext = bpy.data.texts.get(self.ce.text_name)
         if not otext:  # original text has been renamed or removed
             return
-        hashes = self.hashes
-        lenl, lenh = len(otext.lines), len(hashes)
-        if lenl > lenh:
-            hashes.extend((0,) * (lenl - lenh))
-        elif lenh > lenl:
-            del hashes[lenl:]
-        elif self.ce.cmax != self.cmax:
-            self.cmax = self.ce.cmax
-            *self.hashes, = (0,) * lenl
-
-        # TODO should use a more elaborate check so
-        # TODO we don't have to rebuild every line after
-        for idx, (line, hash_val) in enumerate(zip(otext.lines, hashes)):
-            if hash(line.body) != hash_val:
-                return self.rebuild_lines(from_line=idx)
-
-    def rebuild_lines(self, from_line=0):
-        otext = bpy.data.texts.get(self.ce.text_name)
-        olines = otext.lines
-        self.hashes = [hash(l.body) for l in otext.lines]
-        wtl = self.WrapTextLine
-        cmax = self.ce.cmax
-        if cmax < 8:
-            cmax = 8
-
-        if not from_line:  # complete wrap rebuild
-            self.lines = []
-
-        else:  # partial wrap rebuild (from line)
-            for idx, line in enumerate(self.lines):
-                if line.oidx == from_line:
-                    del self.lines[idx:]
-                    break
+        self.layout = get_wrap_layout(otext, max(8, self.ce.cmax))
 
-        append = self.lines.append
-        for idx, line in enumerate(olines[from_line:], from_line):
-            pos = start = 0
-            end = cmax
-            body = line.body
-            if len(body) < cmax:
-                append(wtl(body, idx))
-                continue
+    @property
+    def lines(self):
+        return self.layout.lines
 
-            for c in body:
-                if pos - start >= cmax:
-                    append(wtl(body[start:end], idx, is_sub=start > cmax))
-                    start = end
-                    end += cmax
-                elif c is " " or c is "-":
-                    end = pos + 1
-                pos += 1
-            append(wtl(body[start:], idx, is_sub=True))
+    def to_source(self, widx):
+        return self.layout.to_source(widx)
+
+    def to_wrapped(self, oidx):
+        return self.layout.to_wrapped(oidx)
 
 
 # maintain (public) caches and give out handles for editors
@@ -224,7 +325,7 @@ class CodeEditorManager(dict):
             text = bpy.data.texts.get(ce.text_name)
             name = text.name
         self.tcache.ce = ce
-        cache = (hsh, data, spec, ind) = self.tcache[name]
+        cache = (hsh, data, spec, ind, _) = self.tcache[name]
         lenl = len(text.lines)
         lenp = len(data[0])
 
@@ -277,6 +378,51 @@ def draw_lines_2d(seq, color):
     batch.draw(sh_2d)
 
 
+# lines with per-vertex colors in a single batch
+def draw_lines_2d_colored(seq, colors):
+    batch = batch_for_shader(sh_mm, 'LINES', {'pos': seq, 'color': colors})
+    sh_mm_bind()
+    sh_mm_uniform_float("xform", (0.0, 1.0, 0.0, -1.0))
+    sh_mm_uniform_float("xmax", 1e9)
+    sh_mm_uniform_float("opacity", 1.0)
+    batch.draw(sh_mm)
+
+
+# pack minimap symbols and indent guides of the highlighted range into
+# one vertex buffer. returns (symbols, guides) batches sharing it
+def build_minimap_batches(ce):
+    start, end = ce.mmvisl
+    pos = []
+    col = []
+    extend = pos.extend
+    for seg in ce.segments:
+        for idx, elem in enumerate(seg['elements'][start:end], start + 1):
+            for x1, x2, *_ in elem:
+                extend(((x1, idx), (x2, idx)))
+        col.extend(repeat((*seg['col'][:3], 0.4), len(pos) - len(col)))
+    nsyms = len(pos)
+
+    for idx, levels in enumerate((ce.indents or ())[start:end], start):
+        for level in range(levels):
+            x = 4 * level
+            extend(((x, idx + 1), (x, idx)))
+    col.extend(repeat((*ce.segments[0]['col'][:3], 0.1), len(pos) - nsyms))
+
+    if not pos:
+        return None, None
+    vbo = gpu.types.GPUVertBuf(mm_format, len(pos))
+    vbo.attr_fill("pos", pos)
+    vbo.attr_fill("color", col)
+
+    def batch(first, last):
+        if first == last:
+            return None
+        seq = [(i, i + 1) for i in range(first, last, 2)]
+        ibo = gpu.types.GPUIndexBuf(type='LINES', seq=seq)
+        return gpu.types.GPUBatch(type='LINES', buf=vbo, elem=ibo)
+    return batch(0, nsyms), batch(nsyms, len(pos))
+
+
 def draw_quads_2d(seq, color):
     qseq, = [(x1, y1, y2, x1, y2, x2) for (x1, y1, y2, x2) in (seq,)]
     batch = batch_for_shader(sh_2d, 'TRIS', {'pos': qseq})
@@ -293,43 +439,54 @@ def get_widget_unit(context):
     return int((pd * 20 + 36) / 72 + (2 * (p - pd // 72)))
 
 
-# find all multi-line string states
-def get_ml_states(text):
-    ml_states = []
-    ranges = []
-    append = ml_states.append
-    pop = ml_states.pop
-    append2 = ranges.append
-    dbl, sgl = "\"\"\"", "\'\'\'"
+# walk triple quotes in a line and return the tuple of
+# quotes still open at the end, starting from state
+def lex_ml_line(body, state, dbl="\"\"\"", sgl="\'\'\'"):
+    if "\"" in body or "\'" in body:
+        find = body.find
+        for quote in (dbl, sgl):
+            if quote in body:
+                i = find(quote, 0)
+                while i != -1:
+                    if state and state[-1] == quote:
+                        state = state[:-1]
+                    else:
+                        state += (quote,)
+                    i = find(quote, i + 1)
+    return state
 
-    for idx, line in enumerate(text.lines):
 
-        body = line.body
-        if "\"" in body or "\'" in body:
+# persistent multi-line string state per line. an edit only
+# re-lexes from the first changed line until the carried state
+# matches what was cached for the (shifted) unchanged lines
+class MLStateCache:
+    __slots__ = ('hashes', 'states')
 
-            find = body.find
-            if dbl in body:
-                find = body.find
-                i = find(dbl, 0)
-                while i != -1:
-                    if ml_states and ml_states[-1][2] == dbl:
-                        append2(range(ml_states[0][0], idx))
-                        pop()
-                    else:
-                        append((idx, i, dbl))
-                    i = find(dbl, i + 1)
+    def __init__(self):
+        self.hashes = []
+        self.states = []  # quotes left open at end of each line
 
-            if sgl in body:
-                i = find(sgl, 0)
-                while i != -1:
-                    if ml_states and ml_states[-1][2] == sgl:
-                        append2(range(ml_states[0][0], idx))
-                        pop()
-                    else:
-                        append((idx, i, sgl))
-                    i = find(sgl, i + 1)
+    def update(self, bodies):
+        hashes = [*map(hash, bodies)]
+        changed = diff_range(self.hashes, hashes)
+        if changed is None:
+            return
+        self.hashes = hashes
+        pre, oend, end = changed
+        states = self.states
+        states[pre:oend] = repeat((), end - pre)
 
-    return ranges
+        state = states[pre - 1] if pre else ()
+        for idx in range(pre, len(hashes)):
+            state = lex_ml_line(bodies[idx], state)
+            if idx >= end and state == states[idx]:
+                break
+            states[idx] = state
+
+    # line is inside a multi-line string (opening line included,
+    # closing line excluded)
+    def __getitem__(self, idx):
+        return bool(self.states[idx])
 
 
 class MinimapEngine:
@@ -363,19 +520,20 @@ class MinimapEngine:
 
         ce = self.ce
 
+        # get, or make a proxy version of the text
+        c_hash, c_data, special_temp, c_indents, ml_cache = \
+            ce_manager.get_cached(ce)
+
         if ce.word_wrap:
-            ml_states = []
             text = ce.wrap_text
             is_wrap = True
         else:
             text = texts[tidx]
-            ml_states = get_ml_states(text)
+            ml_cache.update(text.as_string().split("\n"))
             is_wrap = False
 
         olines = texts[tidx].lines
         start, end = ce.mmvisl  # visible portion of minimap
-        # get, or make a proxy version of the text
-        c_hash, c_data, special_temp, c_indents = ce_manager.get_cached(ce)
 
         dspecial = c_data['special']    # special keywords (class, def)
         dplain = c_data['plain']        # plain text
@@ -418,11 +576,11 @@ class MinimapEngine:
         specials = self.specials
         special_temp.clear()
         tab_width = ce.st.tab_width
+        # minimap batches are rebuilt only when the range or lines change
+        dirty = ce.mm_key != (id(c_data), start, end)
 
         def is_ml_state(idx):
-            for r in ml_states:
-                if idx in r:
-                    return True
+            return not is_wrap and ml_cache[idx]
 
         def look_back(idx):
             prev = idx - 1
@@ -446,12 +604,16 @@ class MinimapEngine:
 
         for idx, line in enumerate(text.lines[start:end], start):
             bod = line.body
-            hsh = hash(bod)
+            _is_ml_state = is_ml_state(idx)
+            # include the string state so lines re-highlight when
+            # a quote opens or closes above them
+            hsh = hash((bod, _is_ml_state))
 
             if hsh == c_hash[idx]:  # use cached data instead
                 continue
 
             c_hash[idx] = hsh
+            dirty = True
 
             for i in (dspecial, dplain, dnumbers,  # TODO wrap into a function
                       dstrings, dbuiltin, dcomments, dprepro):
@@ -470,11 +632,11 @@ class MinimapEngine:
             elem[1] = 0
 
             is_sub = is_wrap and line.is_sub
-            is_comment = is_sub and olines[line.oidx].body.startswith("#")
+            is_comment = is_sub and \
+                olines[text.to_source(idx)].body.startswith("#")
             if state != 'STRING' or is_sub and is_comment:
                 if not is_sub:
                     state = ""
-            _is_ml_state = is_ml_state(idx)
 
             if _is_ml_state:
                 state = "STRING"
@@ -484,9 +646,9 @@ class MinimapEngine:
             block_close = has_non_ws = any(c not in ws for c in bod)
             enumbod = [*enumerate(bod)]
             # process each line and break into syntax blocks
+            startswith = bod.startswith
             for cidx, c in enumbod:
-                bodsub = bod[cidx:]
-                start_tab = "    " in bodsub[:4]
+                start_tab = startswith("    ", cidx)
                 if timer > 0:
                     timer -= 1
                 elif timer < 0:
@@ -499,18 +661,16 @@ class MinimapEngine:
                             indent += 4
                         # built-in
                         if not state and c in builtin_set:
-                            bodsub = bod[cidx:]
                             for b in builtins:
-                                if b in bodsub[:len(b)]:
+                                if startswith(b, cidx):
                                     close_plain(elem, cidx)
                                     state = 'BUILTIN'
                                     timer = len(b) - 1
                                     break
                         # special (def, class)
                         if not state and c in "dc":
-                            bodsub = bod[cidx:]
                             for b in specials:
-                                if b in bodsub[:len(b)]:
+                                if startswith(b, cidx):
                                     close_plain(elem, cidx)
                                     state = 'SPECIAL'
                                     timer = len(b) - 1
@@ -612,21 +772,33 @@ class MinimapEngine:
         output[6]['elements'] = dspecial  # XXX needs fixing
         # output[7]['elements'] = dtabs
         ce.indents = indents
+        if dirty:
+            ce.mm_key = id(c_data), start, end
+            ce.mm_batches = None
         ce.tag_redraw()
 
 
+cw_cache = {}
+
+
+# character width only changes with font size or ui scale, so it's
+# measured once per change. x offset follows scrolling and is queried
 def get_cw(st):
-    cw = xoffs = 0
-    for idx, line in enumerate(st.text.lines):
-        if line.body:
-            loc = st.region_location_from_cursor
-            xoffs = loc(idx, 0)[0]
-            cw = loc(idx, 1)[0] - xoffs
-            break
+    loc = st.region_location_from_cursor
+    wu = get_widget_unit(bpy.context)
+    key = st.font_size, wu
+    cw = cw_cache.get(key)
+    if cw is None:
+        for idx, line in enumerate(st.text.lines):
+            body = line.body
+            if body and body[0] != "\t":
+                cw = loc(idx, 1)[0] - loc(idx, 0)[0]
+                if cw:
+                    cw_cache[key] = cw
+                break
     if not cw:
-        xoffs = get_widget_unit(bpy.context) // 2
-        cw = round(blf.dimensions(1, "T")[0])
-    return cw, xoffs
+        return round(blf.dimensions(1, "T")[0]), wu // 2
+    return cw, loc(0, 0)[0]
 
 # =====================================================
 #                    OPENGL DRAWCALS
@@ -664,7 +836,9 @@ def draw_callback_px(context):
     maxw = 120 * wu2
     redge = ce.redge = 1 + int(int(rw - (0.2 * wu)) - (0.4 * wu))
 
-    # use different cache for wrapped. less performant, but still cached
+    # use different cache for wrapped. less performant, but still cached.
+    # with word wrap st.top counts wrapped lines, and lines, the minimap
+    # and indents below are all wrapped too, so nothing maps to source
     if word_wrap:
         ce.cmax = cmax = (rw - wu - _x) // cw
         mmw = min((mcw * 0.8 * (redge // cw), maxw))
@@ -703,10 +877,12 @@ def draw_callback_px(context):
     endrange = round(startrange + (rh // mlh))
     ce.opac = opac = min(max(0, (rw - ce.min_width) / 100.0), 1)
 
-    # rebuild minimap visual range
+    # rebuild minimap visual range. padded so small scrolls
+    # reuse the minimap batches instead of rebuilding them
     mmvisrange = range(*ce.mmvisl)
     if startrange not in mmvisrange or endrange not in mmvisrange:
-        ce.mmvisl = startrange, endrange
+        pad = (endrange - startrange) // 2
+        ce.mmvisl = max(0, startrange - pad), endrange + pad
 
     # params are ready, get minimap symbols
     ce.update_text()
@@ -721,9 +897,11 @@ def draw_callback_px(context):
     # draw minimap shadow
     gpu.state.line_width_set(wu2)
     if mmap_enabled or tabw:
+        seq, colors = [], []
         for idx, intensity in enumerate([.2, .1, .07, .05, .03, .02, .01]):
-            color = 0.0, 0.0, 0.0, intensity * opac
-            draw_lines_2d(((x - idx, 0), (x - idx, rh)), color)
+            seq += (x - idx, 0), (x - idx, rh)
+            colors += ((0.0, 0.0, 0.0, intensity * opac),) * 2
+        draw_lines_2d_colored(seq, colors)
 
     # draw minimap/tab divider
     if tabw:
@@ -745,64 +923,43 @@ def draw_callback_px(context):
         draw_quads_2d((p1, p2, p3, p4), color)
 
         # draw slider frame
-        draw_lines_2d((p1, p2), color_frame)
-        draw_lines_2d((p2, p3), color_frame)
-        draw_lines_2d((p3, p4), color_frame)
-        draw_lines_2d((p4, p1), color_frame)
-
-        # draw minimap symbols
-        segments = ce.segments
-        mmxoffs = ledge + 4  # minimap x offset
-        gpu.state.line_width_set((mlh ** 1.02) - 2)
-        for seg in segments:
-            seq = deque()
-            seq_extend = seq.extend
-            color = seg['col'][:3] + (0.4 * opac,)
-            for idx, elem in enumerate(seg['elements'][mmtop:mmbot]):
-                if elem:
-                    y = rh - (mlh * (idx + mmtop + 1) - slide)
-                    for start, end, *_ in elem:
-                        x1 = mmxoffs + (mcw * start)
-                        if x1 > redge:
-                            continue
-
-                        x2 = x1 + (mcw * (end - start))
-                        if x2 > redge:
-                            x2 = redge
-
-                        seq_extend(((x1, y), (x2, y)))
-            draw_lines_2d(seq, color)
-
-    # draw minimap indent guides
-    seq1, seq2 = deque(), deque()
-    seq1_ext, seq2_ext = seq1.extend, seq2.extend
+        draw_lines_2d((p1, p2, p2, p3, p3, p4, p4, p1), color_frame)
+
+        # draw minimap symbols and indent guides from the cached batches
+        if ce.mm_batches is None:
+            ce.mm_batches = build_minimap_batches(ce)
+        symbols, guides = ce.mm_batches
+        sh_mm_bind()
+        sh_mm_uniform_float("xform", (ledge + 4, mcw, rh + slide, mlh))
+        sh_mm_uniform_float("xmax", redge)
+        sh_mm_uniform_float("opacity", opac)
+        if symbols:
+            gpu.state.line_width_set((mlh ** 1.02) - 2)
+            symbols.draw(sh_mm)
+        if guides:
+            gpu.state.line_width_set(wu2)
+            guides.draw(sh_mm)
+
+    # draw editor indent guides
+    seq2 = deque()
+    seq2_ext = seq2.extend
     plain_col = ce.segments[0]['col'][:3]
     color1 = (*plain_col, 0.1)
     color2 = (*plain_col, 0.3 * ce.indent_trans * opac)
     tab_width = st.tab_width
     indent = cw * tab_width
-    show_indents = ce.show_indents
-    for idx, levels in enumerate(ce.indents[mmtop:mmbot], mmtop):
-        if levels:
-            for level in range(levels):
-                if mmap_enabled:
-                    x = ledge + 4 + (mcw * 4 * level)
-                    if x < redge:
-                        ymax = rh + slide - mlh * idx
-                        seq1_ext(((x, ymax - mlh), (x, ymax)))
-
-                # draw editor indent guides
-                if show_indents:
-                    ymax = rh - lh * (1 + idx - sttop) + lh
-                    ymin = ymax - lh
-                    gpu.state.line_width_set(wu2)
-                    if -lh < ymin < rh:
+    if ce.show_indents:
+        gpu.state.line_width_set(wu2)
+        for idx, levels in enumerate(ce.indents[mmtop:mmbot], mmtop):
+            if levels:
+                ymax = rh - lh * (1 + idx - sttop) + lh
+                ymin = ymax - lh
+                if -lh < ymin < rh:
+                    for level in range(levels):
                         x = xoffs + indent * level
                         if x >= _x:
                             seq2_ext(((x, ymin), (x, ymax)))
-                            continue
-    draw_lines_2d(seq1, color1)
-    draw_lines_2d(seq2, color2)
+        draw_lines_2d(seq2, color2)
     # draw tabs
     if tabw:
         tabh = rh / lent
@@ -906,6 +1063,7 @@ class CE_OT_scroll(CodeEditorBase, Operator):
     def invoke(self, context, event):
         st = context.space_data
         self.ce = ce = get_ce(context)
+        # st.top and the minimap count wrapped lines when word wrap is on
         self.lenl = len(ce.word_wrap and ce.wrap_text.lines or st.text.lines)
 
         context.window.cursor_set('HAND')
@@ -1018,6 +1176,7 @@ class CodeEditorMain:
         self.cmax_prev = self.cmax
         self.wrap_text = WrapText(self.text, self) if self.word_wrap else None
         self.mmvisl = 0, 1
+        self.mm_key = self.mm_batches = None
         # syntax theme colors
         current_theme = p.themes.items()[0][0]
         tex_ed = p.themes[current_theme].text_editor
@@ -1294,6 +1453,9 @@ def register():
     register.keymaps = ((km, kmi1), (km, kmi2))
     set_draw(getattr(bpy, "context"))
 
+    bpy.app.driver_namespace["wrap_layouts"] = {
+        "version": WRAP_LAYOUT_VERSION, "get": get_wrap_layout}
+
     import addon_utils
     mod = addon_utils.addons_fake_modules.get(__name__)
     if mod:
@@ -1304,6 +1466,11 @@ def unregister():
     bpy.types.TEXT_HT_header.remove(CodeEditorPrefs.add_to_header)
     set_draw(state=False)
 
+    registry = bpy.app.driver_namespace.get("wrap_layouts")
+    if registry is not None and registry.get("get") is get_wrap_layout:
+        del bpy.app.driver_namespace["wrap_layouts"]
+    wrap_layouts.clear()
+
     for km, kmi in register.keymaps:
         km.keymap_items.remove(kmi)
     del register.keymaps
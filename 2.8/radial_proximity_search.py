@@ -3,6 +3,8 @@ from collections import Counter, deque
 import bmesh
 import bpy
 import mathutils
+import numpy as np
+from bpy.props import EnumProperty
 from bgl import (GL_ALWAYS, GL_BLEND, glDepthFunc, glDisable, glEnable,
                  glPointSize)
 from gpu.types import GPUShader
@@ -53,40 +55,47 @@ common = Counter.most_common
 vec3_nan = nan_vector(3)
 
 
+# the view state the functions below need, with the matrices inverted
+# once per redraw instead of on every ray of a radial search
+def view_inverses(rv3d):
+    return (rv3d.is_perspective, rv3d.view_perspective,
+            inv(rv3d.view_matrix), inv(rv3d.perspective_matrix))
+
+
 # stripped down higher performance versions of view3d utils
 # no mat copy, no clamp, re-arrange calc. values passed as args
 # upwards to 30-40% faster execution from my own testing
-def origin_3d(rv3d, rw, rh, mx, my):
-    if rv3d.is_perspective:
-        return inv(rv3d.view_matrix).translation
+def origin_3d(view, rw, rh, mx, my):
+    is_perspective, view_perspective, iv, p = view
+    if is_perspective:
+        return iv.translation
     dx, dy = -1.0 + mx / rw * 2.0, (2.0 * my / rh) - 1.0
-    p = inv(rv3d.perspective_matrix)
     org_start = p.col[0].xyz * dx + p.col[1].xyz * dy + p.translation
-    if rv3d.view_perspective != 'CAMERA':
+    if view_perspective != 'CAMERA':
         return org_start - p.col[2].xyz
 
 
-def vector_3d(rv3d, rw, rh, mx, my):
-    if rv3d.is_perspective:
-        p = inv(rv3d.perspective_matrix)
+def vector_3d(view, rw, rh, mx, my):
+    is_perspective, view_perspective, iv, p = view
+    if is_perspective:
         out = Vector((-1.0 + mx / rw * 2.0, (2.0 * my / rh) - 1.0, -0.5))
         w = dot(out, p[3].xyz) + p[3][3]
-        return norm(p @ out / w - inv(rv3d.view_matrix).translation).normalized()
-    return norm(-inv(rv3d.view_matrix).col[2].xyz).normalized()
+        return norm(p @ out / w - iv.translation).normalized()
+    return norm(-iv.col[2].xyz).normalized()
 
 
-def location_3d(rv3d, rw, rh, mx, my, depth):
-    vec3 = vector_3d(rv3d, rw, rh, mx, my)
-    start = origin_3d(rv3d, rw, rh, mx, my)
-    if rv3d.is_perspective:
-        view = inv(rv3d.view_matrix).col[2].normalized()
-        return line_plane(start, start + vec3, depth, view, 1)
+def location_3d(view, rw, rh, mx, my, depth):
+    vec3 = vector_3d(view, rw, rh, mx, my)
+    start = origin_3d(view, rw, rh, mx, my)
+    if view[0]:
+        view_z = view[2].col[2].normalized()
+        return line_plane(start, start + vec3, depth, view_z, 1)
     return point_line(depth, start, start + vec3)[0]
 
 
-def ray_cast(rc, rv3d, rw, rh, mx, my):
-    origin = origin_3d(rv3d, rw, rh, mx, my)
-    direction = vector_3d(rv3d, rw, rh, mx, my)
+def ray_cast(rc, view, rw, rh, mx, my):
+    origin = origin_3d(view, rw, rh, mx, my)
+    direction = vector_3d(view, rw, rh, mx, my)
     return rc(origin, direction)[0]
 
 
@@ -118,8 +127,11 @@ fshader = """
 shader = GPUShader(vshader, fshader)
 
 
-def avg_edge_distance(bm):
-    return sum([e.calc_length() for e in bm.edges]) / len(bm.edges)
+def avg_edge_distance(me, co):
+    ev = np.empty(len(me.edges) * 2, dtype=np.int32)
+    me.edges.foreach_get("vertices", ev)
+    ev = ev.reshape(-1, 2)
+    return np.linalg.norm(co[ev[:, 0]] - co[ev[:, 1]], axis=1).mean()
 
 
 def draw(coords):
@@ -135,34 +147,130 @@ def draw(coords):
 # return the functions themselves and store on the class
 # this removes the need to store the bmesh/bvh, since the functions
 # are direct references. not sure of the practical value
-def trees(bm, tot_vsel, mat):
+def trees(bm, co, sel, mat):
     rc = mathutils.bvhtree.BVHTree.FromBMesh(bm).ray_cast
-    size = len(bm.verts) - tot_vsel
-    verts = ((v.co, v.index) for v in bm.verts if not v.select)
-    kd = mathutils.kdtree.KDTree(size)
+    indices = np.flatnonzero(~sel)
+    world = co[indices] @ np.array(mat.to_3x3()).T + mat.translation[:]
+    kd = mathutils.kdtree.KDTree(len(indices))
     insert = kd.insert
-    for vco, idx in verts:
-        insert(mat @ vco, idx)
+    for vco, idx in zip(world.tolist(), indices.tolist()):
+        insert(vco, idx)
     kd.balance()
-    return kd.find_range, rc
-
-
-def search(rc, rv3d, rw, rh, mx, my):
+    return kd.find_range, rc, (world, indices)
+
+
+# trees per mesh, reused by later invocations while the geometry,
+# selection and object transform stay the same. there is no refit for
+# mathutils trees, so any change rebuilds them
+tree_cache = {}
+tree_stats = Counter()
+
+
+def geometry_key(ob):
+    # sync the edit mesh so it can be read in bulk. still far cheaper
+    # than building the trees in python
+    ob.update_from_editmode()
+    me = ob.data
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    sel = np.empty(len(me.vertices), dtype=bool)
+    me.vertices.foreach_get("co", co)
+    me.vertices.foreach_get("select", sel)
+    key = (len(me.vertices), len(me.edges), len(me.polygons),
+           hash(co.tobytes()), hash(sel.tobytes()),
+           tuple(map(tuple, ob.matrix_world)))
+    return key, co.reshape(-1, 3), sel
+
+
+# pointers are reused by new data once a file is loaded
+@bpy.app.handlers.persistent
+def clear_trees(*_):
+    tree_cache.clear()
+    tree_stats.clear()
+
+
+def get_trees(ob, bm):
+    key, co, sel = geometry_key(ob)
+    ptr = ob.data.as_pointer()
+    cached = tree_cache.get(ptr)
+    if cached is not None and cached[0] == key:
+        tree_stats["hits"] += 1
+        tree_stats["last"] = "cached"
+        return cached[1]
+
+    tree_stats["misses"] += 1
+    tree_stats["last"] = "built"
+    find, rc, verts = trees(bm, co, sel, ob.matrix_world)
+    entry = find, rc, avg_edge_distance(ob.data, co) * 0.5, verts
+
+    tree_cache.pop(ptr, None)
+    tree_cache[ptr] = key, entry
+    if len(tree_cache) > 4:
+        del tree_cache[next(iter(tree_cache))]
+    return entry
+
+
+def search(rc, view, rw, rh, mx, my):
     for p in patterns:
         for x, y in p:
-            ret = ray_cast(rc, rv3d, rw, rh, mx + x * 2, my + y * 2)
+            ret = ray_cast(rc, view, rw, rh, mx + x * 2, my + y * 2)
             if ret:
                 return ret
     return ret
 
 
+# alternative to search: the candidate vertices projected to region
+# space once per view change, bucketed in cells as wide as the search
+# radius. the nearest vertex is then in the 3x3 cells around the cursor
+grid_radius = 20  # pixels, as far as the radial patterns reach
+
+
+def screen_grid(verts, rv3d, rw, rh):
+    world, indices = verts
+    h = np.c_[world, np.ones(len(world))] @ np.array(rv3d.perspective_matrix).T
+    w = h[:, 3]
+    front = np.flatnonzero(w > 1e-6)
+    xy = (h[front, :2] / w[front, None] + 1.0) * (rw * 0.5, rh * 0.5)
+    cells = np.floor(xy / grid_radius).astype(np.int64)
+    keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+    buckets = dict(zip(map(tuple, keys.tolist()), np.split(order, bounds)))
+    return xy, world[front], indices[front], buckets
+
+
+def grid_find(grid, mx, my):
+    xy, world, indices, buckets = grid
+    cx, cy = int(mx // grid_radius), int(my // grid_radius)
+    near = [buckets[c] for c in ((cx + i, cy + j)
+            for i in (-1, 0, 1) for j in (-1, 0, 1)) if c in buckets]
+    if not near:
+        return []
+    near = np.concatenate(near)
+    dist = np.hypot(xy[near, 0] - mx, xy[near, 1] - my)
+    i = dist.argmin()
+    if dist[i] > grid_radius:
+        return []
+    return [(Vector(world[near[i]]), int(indices[near[i]]), float(dist[i]))]
+
+
 class MESH_OT_snap_weld(bpy.types.Operator):
     bl_idname = "mesh.snap_weld"
     bl_label = "Snap Weld"
 
+    proximity : EnumProperty(
+        name="Proximity",
+        description="How to find geometry when the cursor misses the mesh",
+        items=[
+            ('RADIAL', "Radial", "Ray cast in rings around the cursor"),
+            ('GRID', "Grid", "Nearest vertex on screen, from a grid of "
+                             "projected vertices")],
+        default='RADIAL')
+
     def exit(self, context):
         bpy.types.SpaceView3D.draw_handler_remove(
             self.draw_handler, 'WINDOW')
+        context.area.header_text_set(None)
         self.redraw()
         return {'CANCELLED'}
 
@@ -179,6 +287,14 @@ class MESH_OT_snap_weld(bpy.types.Operator):
         c = [1 for o in b if o.data.total_vert_sel]
         return a and sum(c) is 1
 
+    def get_grid(self, rv3d, rw, rh):
+        # projected again only when the view or region changes
+        key = rw, rh, tuple(map(tuple, rv3d.perspective_matrix))
+        if key != self.grid_key:
+            self.grid_key = key
+            self.grid = screen_grid(self.verts, rv3d, rw, rh)
+        return self.grid
+
     def modal(self, context, event):
         if event.type == 'MOUSEMOVE':
             mx = event.mouse_region_x
@@ -192,7 +308,7 @@ class MESH_OT_snap_weld(bpy.types.Operator):
             push = buf.append
 
             rv3d = context.region_data
-            args = rc, rv3d, rw, rh, mx, my
+            args = rc, view_inverses(rv3d), rw, rh, mx, my
             hit, found = ray_cast(*args), None
 
             if hit:
@@ -219,13 +335,16 @@ class MESH_OT_snap_weld(bpy.types.Operator):
                 self.update(closest)
 
             if not hit:
-                # start radial search around cursor
-                args = rc, rv3d, rw, rh, mx, my
-                proximity = search(*args)
+                if self.proximity == 'GRID':
+                    grid = self.get_grid(rv3d, rw, rh)
+                    proximity = found = grid_find(grid, mx, my)
+                else:
+                    # start radial search around cursor
+                    proximity = search(*args)
+                    if proximity:
+                        found = find(proximity, self.range)
 
                 if proximity:
-                    found = find(proximity, self.range)
-
                     if found:
                         # semi-duplicate code
                         closest, idx, dist = found[0]
@@ -246,12 +365,10 @@ class MESH_OT_snap_weld(bpy.types.Operator):
 
     def invoke(self, context, event):
         ob = context.object
-        mat = ob.matrix_world
         bm = bmesh.from_edit_mesh(ob.data)
-        tv = ob.data.total_vert_sel
-        
-        self.find, self.rc = trees(bm, tv, mat)
-        self.range = avg_edge_distance(bm) * 0.5
+
+        self.find, self.rc, self.range, self.verts = get_trees(ob, bm)
+        self.grid_key = self.grid = None
 
         # buffer used to stabilize the found points
         self.buf = deque([vec3_nan], maxlen=5)
@@ -265,6 +382,10 @@ class MESH_OT_snap_weld(bpy.types.Operator):
         self.last = None
 
         self.draw_handler = self.register_draw(point)
+        context.area.header_text_set(
+            "Snap Weld: trees %s (%d hits / %d misses)" % (
+                tree_stats["last"], tree_stats["hits"],
+                tree_stats["misses"]))
 
         wm = context.window_manager
         wm.modal_handler_add(self)
@@ -273,6 +394,14 @@ class MESH_OT_snap_weld(bpy.types.Operator):
 
 def register():
     bpy.utils.register_class(MESH_OT_snap_weld)
+    bpy.app.handlers.load_pre.append(clear_trees)
+
+
+def unregister():
+    if clear_trees in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(clear_trees)
+    bpy.utils.unregister_class(MESH_OT_snap_weld)
+    clear_trees()
 
 
 if __name__ == '__main__':
@@ -1,5 +1,8 @@
 import bpy
+import operator
 from bpy_restrict_state import _RestrictContext
+from mathutils import Color, Euler, Matrix, Quaternion, Vector
+from threading import current_thread, main_thread
 
 bl_info = {
     "name": "*Run In Console",
@@ -14,6 +17,12 @@ bl_info = {
 
 _console = None
 _preferences = None
+_output = None
+_worker = None
+
+# values a background run gets back from the main thread without a proxy
+mathutils_types = (Color, Euler, Matrix, Quaternion, Vector)
+plain_types = (int, float, complex, str, bytes, type(None), *mathutils_types)
 
 
 def get_builtins():
@@ -68,60 +77,148 @@ def set_spaces(spaces):
         c_dict[k] = v
 
 
-def delayed_scrollback(items, c_dict=c_dict, type='INFO'):
-    items = "".join(items)
-    assert 1 is 2
-    bpy.app.timers.register(
-        lambda: scrollback_append(
-            items, c_dict=c_dict, type=type),
-        first_interval=0.5)
+class OutputSink:
+    """
+    Buffers console output in memory and appends it to the scrollback in
+    chunks, either from a timer or when a run ends. At most `limit` lines
+    are held, older lines are dropped and their count is reported.
+    """
+    chunk = 500
+    interval = 0.02
+
+    def __init__(self, limit=10000):
+        from collections import deque
+        self.lines = deque(maxlen=limit)
+        self.dropped = 0
+        self.spaces = None
+        self.running = False
+
+    def reset(self):
+        """Drop pending output, eg. when the console areas are gone"""
+        self.lines.clear()
+        self.dropped = 0
+        self.spaces = None
+        self.running = False
+
+    def set_limit(self, limit):
+        if limit != self.lines.maxlen:
+            from collections import deque
+            lines = self.lines
+            self.dropped += max(0, len(lines) - limit)
+            self.lines = deque(lines, maxlen=limit)
+
+    def write(self, text, type='INFO'):
+        if text.endswith("\n"):
+            text = text[:-1]
+
+        new = [(l.replace("\t", "    "), type) for l in text.split("\n")]
+        lines = self.lines
+        self.dropped += max(0, len(lines) + len(new) - lines.maxlen)
+        lines.extend(new)
+
+        # Outside a run, output is appended once the timer fires.
+        if not self.running:
+            self.schedule()
+
+    def schedule(self):
+        if not bpy.app.timers.is_registered(flush_output):
+            bpy.app.timers.register(flush_output, first_interval=0)
+
+    def begin(self, spaces):
+        """Resolve the console target once for the whole run"""
+        self.spaces = spaces
+        self.running = True
+
+    def end(self):
+        self.running = False
+        self.flush(self.chunk)
+        if self.lines:
+            self.schedule()
+
+    def flush(self, count=None):
+        """Append up to count lines to the console, all if count is None"""
+        lines = self.lines
+        spaces = self.spaces or get_console_spaces(c_dict)
+
+        # default to builtin print if no console area exists
+        if not spaces:
+            for text, _ in lines:
+                _print(text)
+            lines.clear()
+            self.dropped = 0
+            self.spaces = None
+            return
+
+        set_spaces(spaces)
+        scrollback = bpy.ops.console.scrollback_append
+
+        if self.dropped and not isinstance(bpy.context, _RestrictContext):
+            try:
+                scrollback(c_dict, text=f"({self.dropped} lines dropped)",
+                           type='INFO')
+                self.dropped = 0
+            except RuntimeError:
+                self.spaces = None
+                return
+
+        if count is None or count > len(lines):
+            count = len(lines)
+
+        for _ in range(count):
+            if isinstance(bpy.context, _RestrictContext):
+                break
+            text, type = lines[0]
+            try:
+                scrollback(c_dict, text=text, type=type)
+            except RuntimeError:
+                # The console may be gone, resolve it again on the next flush.
+                self.spaces = None
+                break
+            lines.popleft()
+
+        if not lines and not self.running:
+            self.spaces = None
+
+
+def flush_output():
+    """Timer callback, appends buffered output a chunk at a time"""
+    if _output is None:
+        return None
+
+    _output.flush(_output.chunk)
+    if _output.lines:
+        return _output.interval
+    return None
 
 
 def scrollback_append(items, c_dict=c_dict, type='INFO'):
-    """Append text to the console using bpy.ops.scrollback_append"""
-    spaces = get_console_spaces(c_dict)
-    if not spaces:  # default to builtin print if no console area exists
-        return _print(*items)
-
-    set_spaces(spaces)
-    scrollback = bpy.ops.console.scrollback_append
-
-    if isinstance(items, str):
-        if items[-1].endswith("\n"):
-            items = items[:-1]
-    elif isinstance(items, list):
+    """Queue text for the console, see OutputSink"""
+    if isinstance(items, list):
         items = "\n".join(items)
-
-    text = ""
-    items = [*reversed([l.replace("\t", "    ") for l in items.split("\n")])]
-
-    while items:
-        if isinstance(bpy.context, _RestrictContext):
-            break
-        try:
-            text = items.pop()
-            scrollback(c_dict, text=text, type=type)
-            ok = True
-        except RuntimeError:
-            ok = False
-            break
-
-    if not ok:
-        if text:
-            items.insert(0, text)
-        return delayed_scrollback("\n".join(items), c_dict, type)
+    _output.write(items, type)
 
 
 def printc(*args, **kwargs):
+    # output meant for a file or when the addon isn't registered
+    if _output is None or kwargs.get('file') is not None:
+        return _print(*args, **kwargs)
+
     sep = kwargs.get('sep', " ")
     end = kwargs.get('end', "\n")
-    spaces = get_console_spaces(c_dict)
-    if not spaces:  # default to builtin print if no console area exists
-        return _print(*args, **kwargs)
-    if not args:
-        scrollback_append("\n", type='OUTPUT')
-        return
-    scrollback_append(sep.join(str(v) for v in args) + end, type='OUTPUT')
+    if sep is None:
+        sep = " "
+    if end is None:
+        end = "\n"
+    text = sep.join(str(v) for v in args) + end
+
+    # prints off the main thread, ie. from background runs and threads
+    # they start, are collected on the worker or go to the builtin print
+    if current_thread() is not main_thread():
+        worker = _worker
+        if worker is None:
+            return _print(text, end="")
+        return worker.write(text)
+    _output.write(text, type='OUTPUT')
 
 
 def update_assume_print(self, context):
@@ -165,6 +262,25 @@ class TEXT_AP_run_in_console_prefs(bpy.types.AddonPreferences):
     show_time: BoolProperty(description="Display elapsed time after execution",
                             default=True, name="Show Elapsed", )
 
+    scrollback_limit: bpy.props.IntProperty(
+        name="Output Limit", default=10000, min=100,
+        description="Maximum lines of output kept per run. Older lines are "
+        "dropped")
+
+    profile_top: bpy.props.IntProperty(
+        name="Top Functions", default=20, min=1,
+        description="Number of functions listed after a profiled run")
+
+    profile_sort: bpy.props.EnumProperty(
+        name="Sort By", default='cumulative',
+        description="Sort order of the profiler table",
+        items=(('cumulative', "Cumulative", "Time spent including sub-calls"),
+               ('tottime', "Total", "Time spent excluding sub-calls"),
+               ('ncalls', "Calls", "Number of calls")))
+
+    profile_save: BoolProperty(name="Save .pstats", description="Save "
+                               "profiler stats next to the blend file")
+
     del BoolProperty
 
     def draw(self, context):
@@ -192,6 +308,17 @@ class Console:
         self.backup = self.modules['__main__']
         self.traceback = ""
         self.perf_time = 0
+        self.profiler = None
+
+        # compiled text blocks by name, see compile
+        self.code_cache = {}
+        self.compile_time = 0
+        self.cache_hit = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # console bindings restored on clear, see baseline
+        self.baselines = {}
 
         self.exc_info = traceback.sys.exc_info
         self.print = self.modules['builtins'].print
@@ -199,39 +326,147 @@ class Console:
         self.format_exception = traceback.format_exception
         self.redirect_stderr = contextlib.redirect_stderr
 
-    def runsource(self, source, file="<input>"):
+    def compile(self, source, file):
+        """
+        Compile source, a string or a text block. Text blocks are cached by
+        name and reused while their lines and file path are unchanged.
+        """
+        if isinstance(source, str):
+            return compile(source, file, 'exec')
+
+        bodies = tuple(l.body for l in source.lines)
+        key = hash(bodies), file
+
+        entry = self.code_cache.get(source.name)
+        if entry is not None and entry[0] == key and entry[1] == bodies:
+            self.cache_hit = True
+            self.cache_hits += 1
+            self.compile_time = 0
+            return entry[2]
+
+        self.cache_hit = False
+        self.cache_misses += 1
+
+        # drop entries of removed text blocks
+        for name in [k for k in self.code_cache if k not in bpy.data.texts]:
+            del self.code_cache[name]
+
+        perf_start = self.perf_counter()
+        code = compile("\n".join(bodies), file, 'exec')
+        self.compile_time = self.perf_counter() - perf_start
+
+        self.code_cache[source.name] = key, bodies, code
+        return code
+
+    def prepare(self, file):
+        """Reset the module namespace for a new run and return it"""
         namespace = self.module.__dict__
         namespace.clear()
         namespace.update(self.template_dict, __file__=file)
+        self.profiler = None
+        return namespace
 
-        self.modules['__main__'] = self.module
+    def execute(self, code, namespace, profile=False):
         perf_counter = self.perf_counter
 
-        try:
-            code = compile(source, file, 'exec')
-
-            # measure only the actual execution
+        # measure only the actual execution
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            perf_start = perf_counter()
+            self.profiler.runcall(exec, code, namespace)
+        else:
             perf_start = perf_counter()
             exec(code, namespace)
-            self.perf_time = perf_counter() - perf_start
+        self.perf_time = perf_counter() - perf_start
+
+    def set_traceback(self, file):
+        # skip frames leading up to the source, ie. runsource, compile
+        # and the profiler
+        exc_type, exc, tb = self.exc_info()
+        while tb and tb.tb_frame.f_code.co_filename != file:
+            tb = tb.tb_next
+
+        # frames of this module past the source are MainThreadProxy calls
+        internal = f'  File "{__file__}"'
+        trace = self.format_exception(exc_type, exc, tb)
+        self.traceback = "".join(
+            t for t in trace if not t.startswith(internal))
+
+    def store_locals(self):
+        # store module members in blender's console. only names the run
+        # defined, the template underneath is left out
+        if _preferences.persistent:
 
-        except (KeyboardInterrupt, Exception):
+            template = self.template_dict
+            defined = {k: v for k, v in self.module.__dict__.items()
+                       if k not in template or template[k] is not v}
 
-            trace = self.format_exception(*self.exc_info())
-            self.traceback = "".join(trace[:1] + trace[2:])
+            console = get_bl_console()
+            console.locals.update(defined)
+
+    def baseline(self, prefs):
+        """
+        Bindings restored on clear, layered math, mathutils and C, D in
+        that order. Built once per combination of the keep preferences.
+        """
+        key = prefs.keep_math, prefs.keep_mathutils, prefs.keep_vars
+        names = self.baselines.get(key)
+
+        if names is None:
+            from collections import ChainMap
+
+            layers = []
+            if prefs.keep_vars:
+                layers.append({'C': bpy.context, 'D': bpy.data})
+
+            for keep, name in (prefs.keep_mathutils, 'mathutils'), \
+                              (prefs.keep_math, 'math'):
+                if keep:
+                    mod = self.modules[name]
+                    layers.append({k: v for k, v in mod.__dict__.items()
+                                   if not k.startswith("__")})
+
+            names = self.baselines[key] = dict(ChainMap(*layers))
+        return names
+
+    def runsource(self, source, file="<input>", profile=False):
+        namespace = self.prepare(file)
+        self.modules['__main__'] = self.module
+
+        try:
+            code = self.compile(source, file)
+            self.execute(code, namespace, profile)
+
+        except (KeyboardInterrupt, Exception):
+            self.set_traceback(file)
 
         finally:
             self.modules['__main__'] = self.backup
 
-        # store module members in blender's console
-        if _preferences.persistent:
+        self.store_locals()
 
-            console = get_bl_console()
-            console.locals.update(self.module.__dict__)
+    def runbackground(self, text, file, profile=False):
+        """
+        Start running text on a Worker thread. Returns the worker, or None
+        if the text didn't compile.
+        """
+        namespace = self.prepare(file)
 
-    def runtextblock(self, text):
-        source = "\n".join(l.body for l in text.lines)
+        try:
+            code = self.compile(text, file)
+        except (KeyboardInterrupt, Exception):
+            self.set_traceback(file)
+            self.store_locals()
+            return None
 
+        global _worker
+        worker = _worker = Worker(self, text.name, file)
+        namespace.update(worker.namespace())
+        worker.start(code, namespace, profile)
+        return worker
+
+    def runtextblock(self, text, profile=False, background=False):
         prefs = _preferences
 
         if prefs.show_name:
@@ -242,43 +477,390 @@ class Console:
 
             con_locals = get_bl_console().locals
             con_locals.clear()
+            con_locals.update(self.baseline(prefs))
 
-            if prefs.keep_math:
-
-                mod = self.modules['math']
-                for k, v in mod.__dict__.items():
-                    if not k.startswith("__"):
-                        con_locals[k] = v
+        file = bpy.data.filepath + "\\" + text.name
+        if background:
+            worker = self.runbackground(text, file, profile)
+            if worker is not None:
+                return worker
+        else:
+            self.runsource(text, file=file, profile=profile)
 
-            if prefs.keep_mathutils:
-
-                mod = self.modules['mathutils']
-                for k, v in mod.__dict__.items():
-                    if not k.startswith("__"):
-                        con_locals[k] = v
-
-            if prefs.keep_vars:
-                con_locals['C'] = bpy.context
-                con_locals['D'] = bpy.data
+        self.report(text.name)
+        return None
 
-        self.runsource(source, file=bpy.data.filepath + "\\" + text.name)
+    def report(self, name):
+        """Print the traceback, timings and profile of the last run"""
+        prefs = _preferences
 
         if self.traceback:
             scrollback_append(self.traceback, type='ERROR')
 
         if prefs.show_time and getattr(self, "perf_time", 0):
-            # format the numbers so they look nicer
-            time_ms = self.perf_time * 1000
-            precision = 3
-            for num, prec in ((1e3, 0), (1e2, 1), (1e1, 2)):
-                if time_ms >= num:
-                    precision = prec
-
-            perf_fmt = f"{time_ms:.{precision}f} ms"
+            if self.cache_hit:
+                compile_fmt = "cached"
+            else:
+                compile_fmt = f"compiled in {format_ms(self.compile_time)}"
+
+            perf_fmt = (f"{format_ms(self.perf_time)}  ({compile_fmt}, "
+                        f"{self.cache_hits} hits / {self.cache_misses} misses)")
             scrollback_append(perf_fmt, type='INFO')
             self.perf_time = 0
         self.traceback = ""
 
+        if self.profiler is not None:
+            self.report_profile(name)
+            self.profiler = None
+
+    def report_profile(self, name):
+        """Print the top functions of the last profiled run"""
+        import io
+        import os
+        import pstats
+
+        prefs = _preferences
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+
+        if prefs.profile_save:
+            filepath = bpy.data.filepath
+            if filepath:
+                blend = os.path.splitext(os.path.basename(filepath))[0]
+                name = bpy.path.clean_name(f"{blend}_{name}")
+                path = os.path.join(os.path.dirname(filepath), name + ".pstats")
+                stats.dump_stats(path)
+                scrollback_append(f"Saved {path}", type='INFO')
+            else:
+                scrollback_append("Save the blend file to write .pstats",
+                                  type='INFO')
+
+        stats.strip_dirs().sort_stats(prefs.profile_sort)
+        stats.print_stats(prefs.profile_top)
+        scrollback_append(stream.getvalue().strip("\n"), type='OUTPUT')
+
+
+def format_ms(seconds):
+    # format the numbers so they look nicer
+    time_ms = seconds * 1000
+    precision = 3
+    for num, prec in ((1e3, 0), (1e2, 1), (1e1, 2)):
+        if time_ms >= num:
+            precision = prec
+    return f"{time_ms:.{precision}f} ms"
+
+
+class MainThreadProxy:
+    """
+    Stand-in for bpy inside a background run. Attribute and item access,
+    iteration, calls and operators are queued to the main thread by the
+    Worker. Plain values (numbers, strings, unwrapped mathutils) come back
+    as is, anything else is wrapped again. mathutils values owned by bpy
+    stay proxies so writes reach their owner, use .copy() for a plain one.
+    Subclassing and isinstance against proxied types are not supported.
+    """
+    __slots__ = ('_obj', '_worker')
+
+    def __init__(self, obj, worker):
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_worker', worker)
+
+    def __getattr__(self, name):
+        return self._worker.call(getattr, self._obj, name)
+
+    def __setattr__(self, name, value):
+        self._worker.call(setattr, self._obj, name, value)
+
+    def __delattr__(self, name):
+        self._worker.call(delattr, self._obj, name)
+
+    def __getitem__(self, key):
+        return self._worker.call(operator.getitem, self._obj, key)
+
+    def __setitem__(self, key, value):
+        self._worker.call(operator.setitem, self._obj, key, value)
+
+    def __delitem__(self, key):
+        self._worker.call(operator.delitem, self._obj, key)
+
+    def __call__(self, *args, **kwargs):
+        return self._worker.call(self._obj, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._worker.call(list, self._obj))
+
+    def __len__(self):
+        return self._worker.call(len, self._obj)
+
+    def __contains__(self, item):
+        return self._worker.call(operator.contains, self._obj, item)
+
+    def __bool__(self):
+        return self._worker.call(bool, self._obj)
+
+    def __eq__(self, other):
+        return self._worker.call(operator.eq, self._obj, other)
+
+    def __ne__(self, other):
+        return self._worker.call(operator.ne, self._obj, other)
+
+    def __hash__(self):
+        return self._worker.call(hash, self._obj)
+
+    def __repr__(self):
+        return self._worker.call(repr, self._obj)
+
+    def __str__(self):
+        return self._worker.call(str, self._obj)
+
+
+class Worker:
+    """
+    Runs a compiled text block on a background thread. The thread reaches
+    bpy through MainThreadProxy only, whose requests are carried out by
+    dispatch_worker, a timer on the main thread. Prints from the thread
+    are collected here and passed on to the OutputSink.
+    """
+    interval = 0.01  # seconds between dispatches
+    budget = 0.005   # seconds a dispatch may keep serving requests
+    redraw = 0.1     # seconds between console header redraws
+
+    def __init__(self, console, name, file):
+        from collections import deque
+        from queue import Queue
+        self.console = console
+        self.name = name
+        self.file = file
+        self.requests = Queue()
+        self.output = deque()
+        self.progress = None
+        self.cancelled = False
+        self.done = False
+        self.finished = False
+        self.thread = None
+        self.globals = None
+        self.start_time = console.perf_counter()
+        self.redraw_time = 0
+
+    def namespace(self):
+        """Names the text block sees in place of bpy and print"""
+        import builtins
+        real_import = builtins.__import__
+
+        def bpy_import(name, globals=None, locals=None, fromlist=(), level=0):
+            module = real_import(name, globals, locals, fromlist, level)
+            if level == 0 and (name == "bpy" or name.startswith("bpy.")):
+                return MainThreadProxy(module, self)
+            return module
+
+        def progress(value):
+            """Report progress, 0.0 - 1.0, in the console header"""
+            self.progress = min(max(float(value), 0.0), 1.0)
+
+        builtins_dict = dict(builtins.__dict__, __import__=bpy_import,
+                             print=printc)
+        return {'__builtins__': builtins_dict,
+                'bpy': MainThreadProxy(bpy, self),
+                'progress': progress}
+
+    def start(self, code, namespace, profile):
+        import threading
+        self.globals = namespace
+        self.thread = threading.Thread(
+            target=self.run, args=(code, namespace, profile),
+            name=f"run_in_console: {self.name}", daemon=True)
+        self.thread.start()
+        bpy.app.timers.register(dispatch_worker, first_interval=0)
+
+    def run(self, code, namespace, profile):
+        """Thread target"""
+        try:
+            self.console.execute(code, namespace, profile)
+        except (KeyboardInterrupt, Exception):
+            # a run abandoned on file load has nothing left to report to
+            if not self.finished:
+                self.console.set_traceback(self.file)
+        finally:
+            self.done = True
+
+    def write(self, text):
+        """printc from the worker thread"""
+        self.output.append(text)
+
+    def elapsed(self):
+        return self.console.perf_counter() - self.start_time
+
+    def call(self, func, *args, **kwargs):
+        """Run func on the main thread, from any other thread"""
+        # the main thread, eg. proxies kept in the console after the run,
+        # uses bpy directly. every other thread goes through the queue
+        if current_thread() is main_thread():
+            return self.wrap(func(*unwrap(args), **unwrap(kwargs)))
+
+        self.check()
+
+        import threading
+        request = (func, unwrap(args), unwrap(kwargs), [None, None],
+                   threading.Event())
+        self.requests.put(request)
+
+        # wake up periodically so a cancel isn't missed
+        while not request[4].wait(0.1):
+            self.check()
+
+        result, exc = request[3]
+        if exc is not None:
+            raise exc.with_traceback(None)
+        return self.wrap(result)
+
+    def check(self):
+        """Raise in threads waiting on a run that is cancelled or over"""
+        if self.cancelled:
+            raise KeyboardInterrupt
+        if self.finished:
+            raise RuntimeError("The background run has ended, bpy can "
+                               "only be used from the main thread")
+
+    def wrap(self, value):
+        # wrapped mathutils values stay proxies so writes reach their owner
+        if isinstance(value, plain_types) and \
+                not getattr(value, "is_wrapped", False):
+            return value
+        elif type(value) in {list, tuple}:
+            return type(value)(self.wrap(v) for v in value)
+        return MainThreadProxy(value, self)
+
+    def dispatch(self):
+        """Serve queued requests for at most budget seconds"""
+        from queue import Empty
+
+        perf_counter = self.console.perf_counter
+        deadline = perf_counter() + self.budget
+        requests = self.requests
+        wait = 0
+
+        while True:
+            try:
+                # once serving, give the thread a moment to queue the next
+                request = requests.get(timeout=wait) if wait else \
+                    requests.get_nowait()
+            except Empty:
+                break
+
+            func, args, kwargs, box, event = request
+            try:
+                box[0] = func(*args, **kwargs)
+            except BaseException as exc:
+                box[1] = exc
+            finally:
+                event.set()
+
+            wait = deadline - perf_counter()
+            if wait <= 0:
+                break
+
+        output = self.output
+        while output:
+            _output.write(output.popleft(), type='OUTPUT')
+        _output.flush(_output.chunk)
+
+        if perf_counter() - self.redraw_time > self.redraw:
+            self.redraw_time = perf_counter()
+            for area in list_consoles(bpy.context):
+                area.tag_redraw()
+
+    def cancel(self):
+        """Interrupt the thread with a KeyboardInterrupt"""
+        import ctypes
+        self.cancelled = True
+        if self.thread is not None and not self.done:
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(self.thread.ident),
+                ctypes.py_object(KeyboardInterrupt))
+
+    def finish(self, report=True):
+        """Report the run, on the main thread once the thread ended"""
+        global _worker
+        _worker = None
+        self.finished = True
+
+        if not report:
+            return
+
+        # hand the console the real builtins and bpy again
+        namespace = self.globals
+        namespace.update(self.console.template_dict)
+        namespace.pop('progress', None)
+        if isinstance(namespace.get('bpy'), MainThreadProxy):
+            namespace['bpy'] = bpy
+
+        self.console.store_locals()
+        self.console.report(self.name)
+        _output.end()
+
+        for area in list_consoles(bpy.context):
+            area.tag_redraw()
+
+
+def proxy_operator(func, reflected=False):
+    if reflected:
+        def method(self, other):
+            return self._worker.call(func, other, self._obj)
+    else:
+        def method(self, *args):
+            return self._worker.call(func, self._obj, *args)
+    return method
+
+
+# arithmetic and comparisons, mostly for mathutils values owned by bpy.
+# in-place operators fall back to these, then assign through __setattr__
+for name in ('add', 'sub', 'mul', 'matmul', 'truediv', 'floordiv', 'mod',
+             'pow', 'neg', 'pos', 'abs', 'invert', 'lt', 'le', 'gt', 'ge'):
+    setattr(MainThreadProxy, f"__{name}__",
+            proxy_operator(getattr(operator, name)))
+for name in ('add', 'sub', 'mul', 'matmul', 'truediv', 'floordiv', 'mod',
+             'pow'):
+    setattr(MainThreadProxy, f"__r{name}__",
+            proxy_operator(getattr(operator, name), reflected=True))
+del name
+
+
+@bpy.app.handlers.persistent
+def load_pre(*_):
+    """Loading a file ends background runs, their data is about to go"""
+    worker = _worker
+    if worker is not None:
+        worker.cancel()
+        worker.finish(report=False)
+
+    # the console areas output was meant for are gone too
+    if _output is not None:
+        _output.reset()
+
+
+def unwrap(value):
+    if isinstance(value, MainThreadProxy):
+        return object.__getattribute__(value, '_obj')
+    elif type(value) in {list, tuple}:
+        return type(value)(unwrap(v) for v in value)
+    elif type(value) is dict:
+        return {k: unwrap(v) for k, v in value.items()}
+    return value
+
+
+def dispatch_worker():
+    """Timer callback serving the Worker until its thread ends"""
+    worker = _worker
+    if worker is None:
+        return None
+
+    worker.dispatch()
+    if not worker.done:
+        return worker.interval
+
+    worker.finish()
+    return None
+
 
 class TEXT_OT_run_in_console(bpy.types.Operator):
     bl_idname = "text.run_in_console"
@@ -286,6 +868,15 @@ class TEXT_OT_run_in_console(bpy.types.Operator):
     bl_description = ("Run current text block in the console.\n\n"
                       "Needs at least one console area open")
 
+    profile: bpy.props.BoolProperty(
+        name="Profile", options={'SKIP_SAVE'},
+        description="Run under cProfile and list the slowest functions")
+
+    background: bpy.props.BoolProperty(
+        name="Background", options={'SKIP_SAVE'},
+        description="Run on a background thread. bpy access is passed to "
+        "the main thread, call progress(0.0 - 1.0) to show progress")
+
     @classmethod
     def _setup(cls):
         cls._keymaps = []
@@ -297,6 +888,7 @@ class TEXT_OT_run_in_console(bpy.types.Operator):
 
         bpy.types.TEXT_HT_header.append(cls.draw_button)
         bpy.types.CONSOLE_HT_header.append(cls.draw_redirect)
+        bpy.types.CONSOLE_HT_header.append(cls.draw_worker)
         bpy.types.TEXT_MT_context_menu.append(cls.draw_button)
 
 
@@ -309,6 +901,7 @@ class TEXT_OT_run_in_console(bpy.types.Operator):
 
         bpy.types.TEXT_HT_header.remove(cls.draw_button)
         bpy.types.CONSOLE_HT_header.remove(cls.draw_redirect)
+        bpy.types.CONSOLE_HT_header.remove(cls.draw_worker)
         bpy.types.TEXT_MT_context_menu.remove(cls.draw_button)
 
     @classmethod
@@ -332,15 +925,39 @@ class TEXT_OT_run_in_console(bpy.types.Operator):
             row.operator("console.redirect", depress=enable)
             row.enabled = not enable
 
+    def draw_worker(self, context):
+        worker = _worker
+        if worker is None:
+            return
+
+        text = f"{worker.name}: {worker.elapsed():.1f} s"
+        if worker.progress is not None:
+            text += f"  {worker.progress:.0%}"
+
+        row = self.layout.row(align=True)
+        row.label(text=text, icon='TIME')
+        row.operator("text.run_in_console_cancel", text="", icon='CANCEL')
+
     def draw_button(self, context):
-        row = self.layout.row()
         text = "" if "context_menu" not in self.bl_idname else "Run In Console"
-        row.operator("text.run_in_console", text=text, icon='CONSOLE')
+        col = self.layout.column() if text else self.layout.row()
+        col.operator("text.run_in_console", text=text, icon='CONSOLE')
+
+        # the context menu also gets the profiler variant
+        if text:
+            col.operator("text.run_in_console", text="Run With Profiler",
+                         icon='CONSOLE').profile = True
+            col.operator("text.run_in_console", text="Run In Background",
+                         icon='CONSOLE').background = True
 
         if not TEXT_OT_run_in_console.any_console(context):
-            row.enabled = False
+            col.enabled = False
 
     def execute(self, context):
+        if _worker is not None:
+            self.report({'WARNING'}, "A text block is running in the background")
+            return {'CANCELLED'}
+
         spaces = get_console_spaces(context)
 
         if spaces:
@@ -348,7 +965,17 @@ class TEXT_OT_run_in_console(bpy.types.Operator):
             # have topass it everywhere or generate new each time
             c_dict.update(**context.copy())
             set_spaces(spaces)
-            _console.runtextblock(context.space_data.text)
+
+            _output.set_limit(_preferences.scrollback_limit)
+            _output.begin(spaces)
+            worker = None
+            try:
+                worker = _console.runtextblock(
+                    context.space_data.text, self.profile, self.background)
+            finally:
+                # background runs end the output once the thread is done
+                if worker is None:
+                    _output.end()
             return {'FINISHED'}
         return {'CANCELLED'}
 
@@ -388,10 +1015,34 @@ class TEXT_PT_run_in_console_settings(bpy.types.Panel):
 
         col.prop(prefs, 'show_name')
         col.prop(prefs, 'show_time')
+        col.prop(prefs, 'scrollback_limit')
+
+        col.label(text="Profiler")
+        col.prop(prefs, 'profile_top')
+        col.prop(prefs, 'profile_sort')
+        col.prop(prefs, 'profile_save')
 
         # only display if accessed from the text editor
         if context.area.type == 'TEXT_EDITOR':
             col.operator("text.run_in_console", text="Run In Console")
+            col.operator("text.run_in_console",
+                         text="Run With Profiler").profile = True
+            col.operator("text.run_in_console",
+                         text="Run In Background").background = True
+
+
+class TEXT_OT_run_in_console_cancel(bpy.types.Operator):
+    bl_idname = "text.run_in_console_cancel"
+    bl_label = "Cancel"
+    bl_description = "Cancel the text block running in the background"
+
+    @classmethod
+    def poll(cls, context):
+        return _worker is not None
+
+    def execute(self, context):
+        _worker.cancel()
+        return {'FINISHED'}
 
 
 class CONSOLE_OT_redirect(bpy.types.Operator):
@@ -490,9 +1141,11 @@ def register():
     module = _module()
     module._preferences = prefs
     module._console = Console()
+    module._output = OutputSink(prefs.scrollback_limit)
     c_dict.update(window_manager=context.window_manager)
 
     update_assume_print(prefs, context)
+    bpy.app.handlers.load_pre.append(load_pre)
 
 
 def unregister():
@@ -507,10 +1160,22 @@ def unregister():
 
         bpy.utils.unregister_class(cls)
 
+    if load_pre in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(load_pre)
+
+    if _worker is not None:
+        _worker.cancel()
+
+    for timer in (flush_output, dispatch_worker):
+        if bpy.app.timers.is_registered(timer):
+            bpy.app.timers.unregister(timer)
+
     # clean up module refs
     module = _module()
     module._preferences = None
     module._console = None
+    module._output = None
+    module._worker = None
 
     # clean up custom properties
     for w in bpy.context.window_manager.windows:
@@ -3,9 +3,11 @@ from gpu import state
 from gpu.shader import from_builtin
 from gpu_extras.batch import batch_for_shader
 
-from mathutils import Vector
-from itertools import chain
-from collections import deque
+from array import array
+from collections import namedtuple
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+from operator import ne
 # from time import perf_counter
 import blf
 if bpy.app.version < (3, 5, 0):
@@ -27,40 +29,39 @@ else:
     shader = from_builtin('UNIFORM_COLOR')
 shader_uniform_float = shader.uniform_float
 shader_bind = shader.bind
-iterchain = chain.from_iterable
-wrap_chars = {' ', '-'}
 p = None
 
 
-def get_matches_curl(substr, strlen, find, selr):
-    match_indices = []
-    idx = find(substr, 0)
-    exclude = range(*selr)
-    append = match_indices.append
-
-    while idx != -1:
+# Yield match columns of substr in find's string, starting in [start, stop).
+# Matches touching the exclude range (the selection itself) are skipped
+def iter_matches(substr, strlen, find, start, stop, exclude=range(0)):
+    idx = find(substr, start)
+    while idx != -1 and idx < stop:
         span = idx + strlen
-
         if idx in exclude or span in exclude:
             idx = find(substr, idx + 1)
             continue
-
-        append(idx)
+        yield idx
         idx = find(substr, span)
 
-    return match_indices
-
-
-def get_matches(substr, strlen, find):
-    match_indices = []
-    append = match_indices.append
-    chr_idx = find(substr, 0)
 
-    while chr_idx != -1:
-        append(chr_idx)
-        chr_idx = find(substr, chr_idx + strlen)
-
-    return match_indices
+# Find matches on lines [first, last) as a flat array of (line, col)
+# pairs. clip(line, body) gives the column range worth searching
+def find_visible(index, substr, first, last, clip, curl, selr):
+    pairs = array('i')
+    extend = pairs.extend
+    strlen = len(substr)
+    bodies = index.bodies
+    search = bodies if p.case_sensitive else index.lowered
+    found = index.find_lines(substr, p.case_sensitive)
+    for idx in found[bisect_left(found, first):bisect_left(found, last)]:
+        start, stop = clip(idx, bodies[idx])
+        exclude = range(*selr) if idx == curl else range(0)
+        matches = iter_matches(substr, strlen, search[idx].find,
+                               start, stop, exclude)
+        for col in matches:
+            extend((idx, col))
+    return pairs
 
 
 def get_colors(draw_type):
@@ -106,29 +107,41 @@ def update_colors(self, context):
 
 
 def to_tris(lineh, pts, y_ofs):
-    y1, y2 = Vector((-1, y_ofs)), Vector((0, lineh))
-    return (*iterchain(
-        [(a, b, by, a, by, ay) for a, b, by, ay in
-            [(a + y1, b + y1, b + y1 + y2, a + y1 + y2) for a, b, _ in pts]]),)
+    tris = []
+    extend = tris.extend
+    for x1, x2, y, *_ in pts:
+        x1 -= 1
+        x2 -= 1
+        y1 = y + y_ofs
+        y2 = y1 + lineh
+        extend(((x1, y1), (x2, y1), (x2, y2), (x1, y1), (x2, y2), (x1, y2)))
+    return tris
 
 
 def to_scroll(lineh, pts, y_ofs):
-    y1, y2 = Vector((-1, y_ofs)), Vector((0, y_ofs))
-    return (*iterchain(
-        [(a, b, by, a, by, ay) for a, b, by, ay in
-            [(a + y1, b + y1, b + y1 + y2, a + y1 + y2) for a, b in pts]]),)
+    return to_tris(y_ofs, pts, y_ofs)
 
 
 def to_lines(lineh, pts, y_ofs):
-    y = Vector((-1, y_ofs + 2))
-    return (*iterchain([(i + y, j + y) for i, j, _ in pts]),)
+    lines = []
+    extend = lines.extend
+    for x1, x2, y, _ in pts:
+        y += y_ofs + 2
+        extend(((x1 - 1, y), (x2 - 1, y)))
+    return lines
 
 
 def to_frames(lineh, pts, y_ofs):
-    y1, y2 = Vector((-1, y_ofs)), Vector((-1, lineh + y_ofs))
-    return (*iterchain(
-        [(a, b, ay, by + Vector((1, 0)), ay, a, by, b) for a, b, ay, by in
-            [(a + y1, b + y1, a + y2, b + y2) for a, b, _ in pts]]),)
+    lines = []
+    extend = lines.extend
+    for x1, x2, y, _ in pts:
+        x1 -= 1
+        x2 -= 1
+        y1 = y + y_ofs
+        y2 = y1 + lineh
+        extend(((x1, y1), (x2, y1), (x1, y2), (x2 + 1, y2),
+                (x1, y2), (x1, y1), (x2, y2), (x2, y1)))
+    return lines
 
 
 batch_types = {
@@ -139,11 +152,62 @@ batch_types = {
                     ('LINES', to_frames))}
 
 
-# Find character width
-def get_cw(loc, firstx, lines):
-    for idx, line in enumerate(lines):
-        if len(line.body) > 1:
-            return loc(idx, 1)[0] - firstx
+# Per-editor mapping of text (line, col) to region pixels. Character width
+# and line height are measured only when font size, ui scale, line numbers,
+# word wrap or region size change. The origin follows scrolling and is
+# queried once per draw, everything else is arithmetic
+class ScreenMap:
+    __slots__ = ('key', 'cw', 'lineh', 'x0', 'y0', 'tab_width')
+
+    def __init__(self):
+        self.key = None
+        self.cw = self.lineh = self.x0 = self.y0 = 0
+        self.tab_width = 4
+
+    def update(self, st, region, bodies, wunits, lineh):
+        loc = st.region_location_from_cursor
+        self.x0, self.y0 = loc(0, 0)
+        key = (st.font_size, wunits, st.show_line_numbers, st.show_word_wrap,
+               st.tab_width, region.width, region.height, len(bodies) > 1)
+        if key == self.key:
+            return
+        # measure on a line that doesn't start with a tab
+        for idx, body in enumerate(bodies):
+            if len(body) > 1 and body[0] != "\t":
+                self.cw = loc(idx, 1)[0] - loc(idx, 0)[0]
+                break
+        else:
+            return  # nothing to measure on, try again next draw
+        self.lineh = lineh
+        if len(bodies) > 1 and not st.show_word_wrap:
+            self.lineh = self.y0 - loc(1, 0)[1]
+        self.tab_width = st.tab_width
+        self.key = key
+
+    # region x of a column, expanding tabs like the editor does
+    def x(self, body, col):
+        if "\t" in body:
+            col = len(body[:col].expandtabs(self.tab_width))
+        return self.x0 + self.cw * col
+
+    # region y of a line without word wrap
+    def y(self, line):
+        return self.y0 - self.lineh * line
+
+
+screen_maps = {}
+
+
+def get_screen_map(context, bodies, wunits, lineh):
+    st = context.space_data
+    key = st.as_pointer()
+    smap = screen_maps.get(key)
+    if smap is None:
+        if len(screen_maps) > 32:  # editors come and go, start over
+            screen_maps.clear()
+        smap = screen_maps[key] = ScreenMap()
+    smap.update(st, context.region, bodies, wunits, lineh)
+    return smap
 
 
 # Find all occurrences and generate points to draw rects
@@ -155,23 +219,25 @@ def get_non_wrapped_pts(context, substr, selr, lineh, wunits):
     st = context.space_data
     txt = st.text
     top = st.top
-    lines = txt.lines
-    curl = txt.current_line
+    curl = txt.current_line_index
     strlen = len(substr)
-    loc = st.region_location_from_cursor
 
-    firstxy = loc(0, 0)
-    x_offset = cw = get_cw(loc, firstxy[0], lines)
+    index = get_search_index(txt)
+    bodies = index.bodies
+    smap = get_screen_map(context, bodies, wunits, lineh)
+    x_offset = cw = smap.cw
+    if not cw:
+        return pts, scrollpts
     str_span_px = cw * strlen
 
     if st.show_line_numbers:
-        x_offset += cw * (len(repr(len(lines))) + 2)
+        x_offset += cw * (len(repr(len(bodies))) + 2)
 
     # Vertical span in pixels
-    lenl = len(st.text.lines)
+    lenl = len(bodies)
     vspan_px = lineh
     if lenl > 1:
-        vspan_px = abs(firstxy[1] - loc(lenl - 1, len(lines[-1].body))[1])
+        vspan_px = smap.lineh * (lenl - 1)
 
     region = context.region
     rw, rh = region.width, region.height
@@ -180,70 +246,44 @@ def get_non_wrapped_pts(context, substr, selr, lineh, wunits):
         args = st, substr, wunits, vspan_px, rw, rh, lineh
         scrollpts = scrollpts_get(*args)
 
-    for idx, line in enumerate(lines[top:top + st.visible_lines + 2], top):
-        body = line.body
-        find = body.lower().find if not p.case_sensitive else body.find
-        if line == curl:
-            match_indices = get_matches_curl(substr, strlen, find, selr)
-        else:
-            match_indices = get_matches(substr, strlen, find)
-
-        if len(match_indices) > 1000:
-            return pts, scrollpts
-
-        for match_idx in match_indices:
-            x1, y1 = loc(idx, match_idx)
-            x2 = x1 + str_span_px
-            if x1 > hor_max_px or x2 <= x_offset:
-                continue
+    # only columns between the gutter and the right edge are searched.
+    # tabs only widen a line, so without them the left edge clips too
+    x0 = smap.x0
+    first_col = max(0, (x_offset - x0) // cw - strlen + 1)
+    last_col = (hor_max_px - x0) // cw + 1
+
+    def clip(idx, body):
+        return 0 if "\t" in body else first_col, last_col
+
+    pairs = find_visible(index, substr, top, top + st.visible_lines + 2,
+                         clip, curl, selr)
+    it = iter(pairs)
+    for idx, match_idx in zip(it, it):
+        x1 = smap.x(bodies[idx], match_idx)
+        y1 = smap.y(idx)
+        x2 = x1 + str_span_px
+        if x1 > hor_max_px or x2 <= x_offset:
+            continue
 
-            char_offset = (x_offset - x1) // cw if x1 < x_offset else 0
-            end_idx = match_idx + strlen
-            end_idx -= 1 + (x2 - hor_max_px) // cw if x2 > hor_max_px else 0
+        char_offset = (x_offset - x1) // cw if x1 < x_offset else 0
+        end_idx = match_idx + strlen
+        end_idx -= 1 + (x2 - hor_max_px) // cw if x2 > hor_max_px else 0
 
-            append((Vector((x1 + cw * char_offset, y1)),
-                    Vector((x2, y1)),
-                    body[match_idx + char_offset:end_idx]))
+        append((x1 + cw * char_offset, x2, y1,
+                bodies[idx][match_idx + char_offset:end_idx]))
 
     return pts, scrollpts
 
 
 # Calculate true top and pixel span when word wrap is turned on
-def calc_top(lines, maxy, lineh, rh, yoffs, char_max):
-    top = 0
-    found = False
-    wrap_offset = maxy + yoffs
-    wrap_span_px = -lineh
-    if char_max < 8:
-        char_max = 8
-    for idx, line in enumerate(lines):
-        wrap_span_px += lineh
-        if wrap_offset < rh:
-            if not found:
-                found = True
-                top = idx
-        wrap_offset -= lineh
-        pos = start = 0
-        end = char_max
-
-        body = line.body
-        if len(body) < char_max:
-            continue
-
-        for c in body:
-            if pos - start >= char_max:
-                wrap_span_px += lineh
-                if wrap_offset < rh:
-                    if not found:
-                        found = True
-                        top = idx
-                wrap_offset -= lineh
-                start = end
-                end += char_max
-            elif c == " " or c == "-":
-                end = pos + 1
-            pos += 1
-    return top, wrap_span_px
+def calc_top(layout, maxy, lineh, rh, yoffs):
+    nwrapped = len(layout.lines)
+    wrap_span_px = lineh * (nwrapped - 1)
+    # first wrapped line whose top is below the region top
+    first = (maxy + yoffs - rh) // lineh + 1
+    if first >= nwrapped:
+        return 0, wrap_span_px
+    return layout.to_source(max(0, first)), wrap_span_px
 
 
 # Find all occurrences and display as lines on scrollbar
@@ -265,15 +305,157 @@ def scrollpts_get(st, substr, wu, vspan_px, rw, rh, lineh):
         blank_lines = vispan - wrh
 
     wrh += blank_lines
-    j = 2 + wrhorg / len(st.text.lines) * pxavail
-    for i, line in enumerate(st.text.lines, 1):
-        body = line.body.lower() if not p.case_sensitive else line.body
-        if substr in body:
-            y = scrolltop - i * j // wrh
-            append((Vector((sx_1, y)), Vector((sx_2, y))))
+    index = get_search_index(st.text)
+    j = 2 + wrhorg / len(index.bodies) * pxavail
+    for i in index.find_lines(substr, p.case_sensitive):
+        y = scrolltop - (i + 1) * j // wrh
+        append((sx_1, sx_2, y))
     return scrollpts
 
 
+# find the region that differs between two hash lists by their common
+# prefix and suffix. returns (start, old end, new end) or None if equal
+def diff_range(old, new):
+    if old == new:
+        return None
+    lim = min(len(old), len(new))
+    pre = [*map(ne, old, new), True].index(True)
+    rdiff = map(ne, reversed(old[pre:]), reversed(new[pre:]))
+    suf = min([*rdiff, True].index(True), lim - pre)
+    return pre, len(old) - suf, len(new) - suf
+
+
+# a wrapped line, body is the part of the original line starting at start
+WrapLine = namedtuple("WrapLine", "body start")
+
+
+# word wrap breaks of a line, the same way the text editor does them
+def wrap_line(body, char_max):
+    if len(body) < char_max:
+        return [WrapLine(body, 0)]
+
+    span = []
+    append = span.append
+    pos = start = 0
+    end = char_max
+    for c in body:
+        if pos - start >= char_max:
+            append(WrapLine(body[start:end], start))
+            start = end
+            end += char_max
+        elif c == " " or c == "-":
+            end = pos + 1
+        pos += 1
+    append(WrapLine(body[start:], start))
+    return span
+
+
+# word wrap breaks of a whole text, rebuilt when the text changes. only
+# used when code editor isn't there to share its layouts
+class WrapBreaks:
+    __slots__ = ('char_max', 'text_hash', 'spans', 'offsets', 'lines')
+
+    def __init__(self, char_max, text_hash, bodies):
+        self.char_max = char_max
+        self.text_hash = text_hash
+        spans = self.spans = [wrap_line(body, char_max) for body in bodies]
+        self.offsets = [*accumulate(map(len, spans), initial=0)]
+        self.lines = [*chain.from_iterable(spans)]
+
+    # original line index of a wrapped line
+    def to_source(self, widx):
+        return bisect_right(self.offsets, widx) - 1
+
+
+wrap_breaks = {}
+
+# version of the code editor layouts this add-on knows how to read
+WRAP_LAYOUT_VERSION = 1
+
+
+# word wrap layout of a text. code editor owns the layouts and publishes
+# them in driver_namespace, they're only read when the version matches
+def get_wrap_layout(text, char_max):
+    registry = bpy.app.driver_namespace.get("wrap_layouts")
+    if registry is not None and registry.get("version") == WRAP_LAYOUT_VERSION:
+        return registry["get"](text, char_max)
+
+    string = text.as_string()
+    text_hash = hash(string)
+    breaks = wrap_breaks.get(text.name)
+    if breaks is None or breaks.char_max != char_max or \
+            breaks.text_hash != text_hash:
+        for name in [n for n in wrap_breaks if n not in bpy.data.texts]:
+            del wrap_breaks[name]
+        breaks = wrap_breaks[text.name] = WrapBreaks(
+            char_max, text_hash, string.split("\n"))
+    return breaks
+
+
+# line bodies of a text kept in sync from line hashes, with a lowercased
+# copy and a cache of matching line indices per search term
+class SearchIndex:
+    __slots__ = ('text_hash', 'hashes', 'bodies', 'lowered', 'results')
+
+    def __init__(self):
+        self.text_hash = None
+        self.hashes = []
+        self.bodies = []
+        self.lowered = []
+        self.results = {}  # (term, case sensitive): sorted line indices
+
+    def update(self, text):
+        string = text.as_string()
+        text_hash = hash(string)
+        if text_hash == self.text_hash:
+            return
+        self.text_hash = text_hash
+        bodies = self.bodies = string.split("\n")
+        hashes = [*map(hash, bodies)]
+        changed = diff_range(self.hashes, hashes)
+        self.hashes = hashes
+        if changed is None:
+            return
+        pre, oend, nend = changed
+        self.lowered[pre:oend] = [body.lower() for body in bodies[pre:nend]]
+
+        # patch cached results for the changed lines and shift the rest
+        shift = nend - oend
+        for (term, case_sensitive), found in self.results.items():
+            lines = bodies if case_sensitive else self.lowered
+            lo, hi = bisect_left(found, pre), bisect_left(found, oend)
+            new = [i for i in range(pre, nend) if term in lines[i]]
+            found[lo:hi] = new
+            if shift:
+                rest = lo + len(new)
+                found[rest:] = [i + shift for i in found[rest:]]
+
+    # indices of lines containing term
+    def find_lines(self, term, case_sensitive):
+        key = term, case_sensitive
+        found = self.results.get(key)
+        if found is None:
+            if len(self.results) >= 8:  # drop the oldest
+                del self.results[next(iter(self.results))]
+            lines = self.bodies if case_sensitive else self.lowered
+            found = self.results[key] = [
+                i for i, body in enumerate(lines) if term in body]
+        return found
+
+
+search_indices = {}
+
+
+def get_search_index(text):
+    index = search_indices.get(text.name)
+    if index is None:
+        for name in [n for n in search_indices if n not in bpy.data.texts]:
+            del search_indices[name]
+        index = search_indices[text.name] = SearchIndex()
+    index.update(text)
+    return index
+
+
 def get_wrapped_pts(context, substr, selr, lineh, wunits):
     # t = perf_counter()
 
@@ -283,13 +465,16 @@ def get_wrapped_pts(context, substr, selr, lineh, wunits):
 
     st = context.space_data
     txt = st.text
-    lines = txt.lines
-    curl = txt.current_line
-    lenl = len(lines)
+    curl = txt.current_line_index
 
     loc = st.region_location_from_cursor
-    firstxy = loc(0, 0)
-    x_offset = cw = get_cw(loc, firstxy[0], lines)
+    index = get_search_index(txt)
+    bodies = index.bodies
+    lenl = len(bodies)
+    smap = get_screen_map(context, bodies, wunits, lineh)
+    x_offset = cw = smap.cw
+    if not cw:
+        return pts, scrollpts
 
     if st.show_line_numbers:
         x_offset += cw * (len(repr(lenl)) + 2)
@@ -303,116 +488,60 @@ def get_wrapped_pts(context, substr, selr, lineh, wunits):
 
     line_height_dpi = int((wunits * st.font_size) / 20)
     y_offset = int(line_height_dpi * 0.3)
-    top, vspan_px = calc_top(lines, firstxy[1], lineh, rh, y_offset, char_max)
+    layout = get_wrap_layout(txt, char_max)
+    spans, offsets = layout.spans, layout.offsets
+    top, vspan_px = calc_top(layout, smap.y0, lineh, rh, y_offset)
     strlen = len(substr)
 
-    # Screen coord tables for fast lookup of match positions
-    x_table = range(0, cw * char_max, cw)
     y_top = loc(top, 0)[1]
-    y_table = range(y_top, y_top - vspan_px, -lineh)
-    y_table_size = len(y_table)
-
-    wrap_total = w_count = wrap_offset = 0
+    # wrapped lines counted from top that are inside the region
+    row_min = -((rh - y_top) // lineh)
+    row_max = (y_top + lineh) // lineh
 
     # Generate points for scrollbar highlights
-    # if p.show_in_scroll:
     if p.show_in_scroll:
         args = st, substr, wunits, vspan_px, rw, rh, lineh
         scrollpts = scrollpts_get(*args)
 
-    # Generate points for text highlights
-    for l_idx, line in enumerate(lines[top:top + st.visible_lines + 4], top):
-        body = line.body
-        find = body.lower().find if not p.case_sensitive else body.find
+    # only search the part of a line that wraps into the region
+    def clip(l_idx, body):
+        starts = [w.start for w in spans[l_idx]]
+        base = offsets[l_idx] - offsets[top]
+        lo = max(0, row_min - base)
+        hi = row_max - base + 1
+        if lo >= len(starts) or hi <= 0:
+            return 0, 0
+        stop = starts[hi] if hi < len(starts) else len(body)
+        return max(0, starts[lo] - strlen + 1), stop
 
-        if line == curl:
-            # Selected line is processed separately
-            match_indices = get_matches_curl(substr, strlen, find, selr)
-        else:
-            match_indices = get_matches(substr, strlen, find)
-
-        # Hard max for match finding
-        if len(match_indices) > 1000:
-            return pts, scrollpts
-
-        # Wraps
-        w_list = []
-        w_start = 0
-        w_end = char_max
-        w_count = -1
-        coords = deque()
-
-        # Simulate word wrapping for displayed text and store
-        # local text coordinates and wrap indices for each line.
-        for idx, char in enumerate(body):
-            if idx - w_start >= char_max:
-                w_list.append(body[w_start:w_end])
-                w_count += 1
-                coords.extend([(i, w_count) for i in range(w_end - w_start)])
-                w_start = w_end
-                w_end += char_max
-            elif char in wrap_chars:
-                w_end = idx + 1
-
-        w_list.append(body[w_start:])
-        w_end = w_start + (len(body) - w_start)
-        w_count += 1
-        coords.extend([(i, w_count) for i in range(w_end - w_start)])
-        w_indices = [i for i, _ in enumerate(w_list) for _ in _]
-
-        # screen coords for wrapped char/line by match index
-        for match_idx in match_indices:
-            mspan = match_idx + strlen
-
-            w_char, w_line = coords[match_idx]
-            w_char_end, w_line_end = coords[mspan - 1]
-
-            # in edge cases where a single wrapped line has
-            # several thousands of matches, skip and continue
-            if w_line > y_table_size or w_line_end > y_table_size:
-                continue
-
-            matchy = y_table[w_line] - wrap_offset
+    # Generate points for text highlights
+    pairs = find_visible(index, substr, top, top + st.visible_lines + 4,
+                         clip, curl, selr)
+    it = iter(pairs)
+    for l_idx, match_idx in zip(it, it):
+        body = bodies[l_idx]
+        span = spans[l_idx]
+        starts = [w.start for w in span]
+        base = offsets[l_idx] - offsets[top]
+        mspan = match_idx + strlen
+
+        # split the match at wraps, one rect per wrapped line
+        w_line = bisect_right(starts, match_idx) - 1
+        w_line_end = bisect_right(starts, mspan - 1) - 1
+        for w in range(w_line, w_line_end + 1):
+            matchy = y_top - lineh * (base + w)
             if matchy > rh or matchy < -lineh:
                 continue
-
-            co_1 = Vector((x_offset + x_table[w_char], matchy))
-
-            if w_line != w_line_end:
-                start = match_idx
-                end = wrap_idx = 0
-
-                for midx in range(strlen):
-                    widx = match_idx + midx
-                    w_char, w_line = coords[widx]
-                    matchy = y_table[w_line] - wrap_offset
-
-                    if matchy != co_1.y:
-                        co_2 = Vector((x_table[w_char - 1] + cw + x_offset,
-                                       y_table[w_line - 1] - wrap_offset))
-
-                        if wrap_idx:
-                            text = w_list[w_indices[widx - 1]]
-                        else:
-                            text = body[start:widx]
-                        append((co_1, co_2, text))
-                        co_1 = Vector((x_offset + x_table[w_char], matchy))
-                        end = midx
-                        start += end
-                        wrap_idx += 1
-                        continue
-                text = body[match_idx:mspan][end:]
-                co_2 = Vector((x_offset + x_table[w_char] + cw, matchy))
-                append((co_1, co_2, text))
-
+            w_start = starts[w]
+            first = max(match_idx, w_start)
+            if w < w_line_end:  # continues on next wrapped line
+                last = w_start + len(span[w].body)
             else:
-                text = body[match_idx:mspan]
-                co_2 = co_1.copy()
-                co_2.x += cw * strlen
-                append((co_1, co_2, text))
+                last = mspan
+            x2 = x_offset + cw * (last - w_start)
+            append((x_offset + cw * (first - w_start), x2, matchy,
+                    body[first:last]))
 
-        wrap_total += w_count + 1
-        wrap_offset = lineh * wrap_total
     # t2 = perf_counter()
     # print("draw:", round((t2 - t) * 1000, 2), "ms")
     return pts, scrollpts
@@ -475,9 +604,8 @@ def draw_highlights(context):
         # highlight font overlay starts here
         fontid = 1
         blf.color(fontid, *p.fg_col)
-        for co, _, substring in pts:
-            co.y += y_offset
-            blf.position(fontid, *co, 1)
+        for x, _, y, substring in pts:
+            blf.position(fontid, x, y + y_offset, 1)
             blf.draw(fontid, substring)
     # t2 = perf_counter()
     # print("draw:", round((t2 - t) * 1000, 2), "ms")
@@ -668,4 +796,5 @@ def unregister():
 
     bpy.types.TEXT_MT_view.remove(HighlightOccurrencesPrefs.draw_menu)
     bpy.utils.unregister_class(HighlightOccurrencesPrefs)
+    wrap_breaks.clear()
     redraw(getattr(bpy, "context"))
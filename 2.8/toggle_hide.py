@@ -24,7 +24,7 @@
 
 import bpy
 from ctypes import c_int, c_float, c_void_p, c_short, c_char, c_char_p, \
-    c_uint, Structure, Union, POINTER
+    c_uint, Structure, Union, POINTER, addressof
 from typing import List
 
 
@@ -252,38 +252,18 @@ class TreeElement(StructBase):
             parent = parent.contents.parent
         return tuple(reversed(link))[1:]
 
-    def as_object(self, root):
+    def as_object(self, root, index=None):
         """
         Return the bpy.types.Object or LayerCollection instance.
+        Pass an OutlinerIndex of root when resolving many elements.
         """
+        if index is None:
+            index = OutlinerIndex(root)
 
-        view_layer = bpy.context.view_layer
-        objects = view_layer.objects
-
-        for t in subtrees_get(root):
-            if t.treeid != self.treeid:
-                continue
-
-            name = t.name.decode()
-            idcode = t.idcode
-
-            # Is a bpy.types.LayerCollection subtree
-            if idcode == ID_LAYERCOLL:
-                # Layer collections can be nested resolve the hierarchy.
-                layer_coll = view_layer.layer_collection
-                for p in [t.name.decode() for t in self._resolve()]:
-                    layer_coll = layer_coll.children[p]
-                return layer_coll
-
-            # Is a bpy.types.Object subtree
-            elif idcode == ID_OB:
-                return objects[name]
-
-            # Could handle other types, eg. meshes.
-            else:
-                pass
-
-        return None
+        path = index.paths.get(addressof(self))
+        if path is None:
+            return None
+        return index.resolve(path)
 
     @staticmethod
     def from_outliner(space: bpy.types.SpaceOutliner):
@@ -396,6 +376,63 @@ def subtrees_get(tree) -> List[TreeElement]:
     return trees[1:]
 
 
+class OutlinerIndex:
+    """
+    Outliner tree and view layer lookups, built in a single traversal.
+
+    paths maps the address of every element below the root to its hierarchy
+    of (name, idcode), the same hierarchy treeid hashes. layer_collections
+    maps the name hierarchy of every layer collection to the instance.
+    """
+
+    def __init__(self, root):
+        self.elements = []
+        self.paths = {}
+
+        # Same traversal order as subtrees_get.
+        pool = [(root.contents, ())]
+        while pool:
+            t, path = pool.pop()
+            if path:
+                self.elements.append((t, path))
+                self.paths[addressof(t)] = path
+
+            child = t.subtree.first
+            while child:
+                c = child.contents
+                pool.append((c, path + ((c.name.decode(), c.idcode),)))
+                child = c.next
+
+        view_layer = bpy.context.view_layer
+        self.objects = view_layer.objects
+        self.layer_collections = {}
+
+        pool = [(view_layer.layer_collection, ())]
+        while pool:
+            layer_coll, names = pool.pop()
+            for child in layer_coll.children:
+                child_names = names + (child.name,)
+                self.layer_collections[child_names] = child
+                pool.append((child, child_names))
+
+    def resolve(self, path):
+        """
+        Return the bpy.types.Object or LayerCollection at path.
+        """
+        name, idcode = path[-1]
+
+        # Is a bpy.types.LayerCollection subtree. These can be nested.
+        if idcode == ID_LAYERCOLL:
+            return self.layer_collections[tuple(n for n, _ in path)]
+
+        # Is a bpy.types.Object subtree
+        elif idcode == ID_OB:
+            return self.objects[name]
+
+        # Could handle other types, eg. meshes.
+        return None
+
+
 def get_any_space_outliner() -> bpy.types.SpaceOutliner | None:
     """
     Try to get the outliner space data from context, otherwise
@@ -438,41 +475,65 @@ class OUTLINER_OT_toggle_hide(bpy.types.Operator):
         root = TreeElement.from_outliner(space)
         wmstruct = wmWindowManager.from_address(context.window_manager.as_pointer())
 
+        view_layer = context.view_layer
+
         # Track processed objects to prevent those that appear in multiple
         # collections from being processed again.
         walked = set()
 
+        # Targets grouped by the state they're toggled to. Collected first so
+        # visibility is applied in bulk instead of interleaved with lookups.
+        layer_colls = []
+        hide = []
+        show = []
+
         outliner_types = {ID_OB, ID_LAYERCOLL}
         WM_OUTLINER_SYNC_SELECT_FROM_OBJECT = 1
 
-        for tree in subtrees_get(root):
+        # Resolve the whole selection from one traversal of the tree.
+        index = OutlinerIndex(root)
+
+        for tree, path in index.elements:
             if tree.idcode not in outliner_types or not tree.select:
                 continue
 
-            obj = tree.as_object(root)
+            obj = index.resolve(path)
             if obj in walked:
                 continue
 
             # Is a layer collection
             elif isinstance(obj, bpy.types.LayerCollection):
-                obj.hide_viewport ^= True
+                layer_colls.append(obj)
 
-            # Is a bpy.types.Object instance
+            # Is a bpy.types.Object instance. Hidden ones are shown and
+            # visible ones hidden.
             elif isinstance(obj, bpy.types.Object):
-                if obj.hide_get():
-                    obj.hide_set(False)
-                    obj.select_set(True)
-                    # Prevent outliner selection sync from object mode specifically.
-                    wmstruct.outliner_sync_select_dirty &= ~WM_OUTLINER_SYNC_SELECT_FROM_OBJECT
-
-                # Is a visible object instance. Hide it.
+                if obj.hide_get(view_layer=view_layer):
+                    show.append(obj)
                 else:
-                    obj.hide_set(True)
+                    hide.append(obj)
 
             # Traversed objects are tracked to prevent multiple instances from
             # toggling eachother.
             walked.add(obj)
 
+        # Layer collections go first, as the tree lists them before their
+        # objects. Object selection depends on collection visibility.
+        for layer_coll in layer_colls:
+            layer_coll.hide_viewport ^= True
+
+        for obj in hide:
+            obj.hide_set(True, view_layer=view_layer)
+
+        for obj in show:
+            obj.hide_set(False, view_layer=view_layer)
+        for obj in show:
+            obj.select_set(True, view_layer=view_layer)
+
+        # Prevent outliner selection sync from object mode specifically.
+        if show:
+            wmstruct.outliner_sync_select_dirty &= ~WM_OUTLINER_SYNC_SELECT_FROM_OBJECT
+
         # Redraw to show any changes.
         if blender_version < (3, 2):
             for ar in space.id_data.areas:
@@ -23,6 +23,7 @@ import bpy
 from bpy.props import FloatProperty, EnumProperty
 from bpy.types import Panel
 import bmesh, math, mathutils as mu
+import numpy as np
 
 ### UV tools
 def addon_prefs():
@@ -51,23 +52,59 @@ def get_any(someset):
     for i in someset:
         return i
 
-def reset_uvs(context, coords):
-    bm = bmesh.from_edit_mesh(context.active_object.data)
+# edit mode UVs only live in the bmesh, so there's no foreach_get/set.
+# read/write them in one pass each and do the math on the arrays
+def read_uvs(ls, uv):
+    return np.array([l[uv].uv[:] for l in ls], dtype=np.float32).reshape(-1, 2)
+
+def write_uvs(ls, uv, co):
+    for l, xy in zip(ls, co.tolist()):
+        l[uv].uv = xy
+
+def write_uv_groups(order, uv, co):
+    for ls, xy in zip(order, co.tolist()):
+        for l in ls:
+            l[uv].uv = xy
+
+def reset_uvs(context, coords, bm):
     uv = bm.loops.layers.uv.verify()
-    for l in coords:
-        l[uv].uv = coords[l]
-    context.active_object.data.update()
+    ls, co = coords
+    write_uvs(ls, uv, co)
+    bmesh.update_edit_mesh(context.active_object.data)
 
 def initial_uvs(frags, bm):
     uv = bm.loops.layers.uv.verify()
-    coords = {}
-    for frag in frags:
-        for l in frag:
-            coords[l] = l[uv].uv.copy()
-    return coords
-
-def same_uv(l, uv):
-    return set([a for a in l.vert.link_loops if a[uv].uv == l[uv].uv])
+    ls = [l for frag in frags for l in frag]
+    return ls, read_uvs(ls, uv)
+
+# UVs this close are one UV vertex, like with mathutils.Vector ==
+UV_EPSILON = 1.1920929e-07
+
+def uv_key(l, uv):
+    u, v = l[uv].uv
+    return l.vert, round(u / UV_EPSILON), round(v / UV_EPSILON)
+
+def index_uvs(ls, uv):
+    # uv_key -> set of loops sharing that UV vertex, for the verts of ls
+    index = {}
+    for vert in set([l.vert for l in ls]):
+        for a in vert.link_loops:
+            index.setdefault(uv_key(a, uv), set()).add(a)
+    return index
+
+def same_uv(l, uv, index):
+    # shared with the index, don't modify
+    return index[uv_key(l, uv)]
+
+def link_uvs(frag, uv):
+    # uv_key -> uv_keys it shares a UV edge with in frag
+    links = {}
+    for a in frag:
+        ka = uv_key(a, uv)
+        kb = uv_key(a.link_loop_next, uv)
+        links.setdefault(ka, set()).add(kb)
+        links.setdefault(kb, set()).add(ka)
+    return links
 
 def uv_gather_sync(bm):
     hes = set()
@@ -93,10 +130,10 @@ def uv_gather_nonsync(bm):
                 hes.add(l)
     return hes
 
-def cache_uvs(ls, uv):
+def cache_uvs(ls, uv, index):
     lookup = {}
     for l in ls:
-        lookup[l] = same_uv(l, uv)
+        lookup[l] = same_uv(l, uv, index)
     return lookup
 
 def extract_frag(ls, lookup, n_lookup):
@@ -131,8 +168,10 @@ def partial_frags(bm, uv):
         hes = uv_gather_sync(bm)
     else:
         hes = uv_gather_nonsync(bm)
-    lookup = cache_uvs(hes, uv)
-    n_lookup = cache_uvs([o.link_loop_next for o in hes], uv)
+    nexts = [o.link_loop_next for o in hes]
+    index = index_uvs(nexts + list(hes), uv)
+    lookup = cache_uvs(hes, uv, index)
+    n_lookup = cache_uvs(nexts, uv, index)
     frags = []
     done = set()
     while hes:
@@ -143,133 +182,56 @@ def partial_frags(bm, uv):
             if len(vs) > 1:
                 frags.append(frag)
                 break
-    return frags
+    return frags, index
 
 def detect_uv_frags(bm):
     uv = bm.loops.layers.uv.verify()
-    frags = partial_frags(bm, uv)
+    frags, index = partial_frags(bm, uv)
     for frag in frags:
         more = set()
         for a in frag:
-            more |= same_uv(a, uv)
-            more |= same_uv(a.link_loop_next, uv)
+            more |= same_uv(a, uv, index)
+            more |= same_uv(a.link_loop_next, uv, index)
         frag |= more
     return frags
 
-def erase_dupes(m1, m2, frag, uv):
-    dupes = set()
-    test = (m1.vert,m1[uv].uv[:],m2.vert,m2[uv].uv[:])
-    for c in frag:
-        d   = c.link_loop_next
-        cv  = c.vert
-        dv  = d.vert
-        cco = c[uv].uv[:]
-        dco = d[uv].uv[:]
-        if test == (cv,cco,dv,dco) or test == (dv,dco,cv,cco):
-            dupes.add(c)
-    frag -= dupes
-
-def extend_chain(item, frag, uv, right_way):
-    l1, l2, fwd = item
-    test1 = (l1.vert,l1[uv].uv[:])
-    test2 = (l2.vert,l2[uv].uv[:])
-    match = None
-    for a in frag:
-        b = a.link_loop_next
-        conn_a = (a.vert,a[uv].uv[:])
-        conn_b = (b.vert,b[uv].uv[:])
-        if right_way:
-            if fwd:
-                if test2 == conn_a:
-                    match = (a,b,True)
-                    break
-                elif test2 == conn_b:
-                    match = (a,b,False)
-                    break
-            else:
-                if test1 == conn_a:
-                    match = (a,b,True)
-                    break
-                elif test1 == conn_b:
-                    match = (a,b,False)
-                    break
-        else:
-            if fwd:
-                if test1 == conn_b:
-                    match = (a,b,True)
-                    break
-                elif test1 == conn_a:
-                    match = (a,b,False)
-                    break
-            else:
-                if test2 == conn_b:
-                    match = (a,b,True)
-                    break
-                elif test2 == conn_a:
-                    match = (a,b,False)
-                    break
-    if not match:
-        return
-    erase_dupes(match[0], match[1], frag, uv)
-    return match
-
-def start_chain(frag, uv):
-    l1 = frag.pop()
-    l2 = l1.link_loop_next
-    erase_dupes(l1, l2, frag, uv)
-    return[(l1,l2,True)]
-
-def prep_chain(chain, uv):
-    order = [list(same_uv(lnk[not lnk[2]], uv)) for lnk in chain]
-    ch_e = chain[-1]
-    which_uv = int(ch_e[2])
-    order.append(list(same_uv(ch_e[which_uv], uv)))
-    is_closed = False
-    if order[0] == order[-1]:
-        is_closed = True
-    return is_closed, order
-
-def order_links(frag, uv):
-    chain = start_chain(frag, uv)
-    start_found = end_found = False
-    while frag and not end_found:
-        lst = extend_chain(chain[-1], frag, uv, True)
-        if lst:
-            chain.append(lst)
-        else:
-            end_found = True
-    while frag and not start_found:
-        fst = extend_chain(chain[0], frag, uv, False)
-        if fst:
-            chain.insert(0, fst)
-        else:
-            start_found = True
-    return prep_chain(chain, uv)
-
-def has_fork(frag, uv):
-    for a in frag:
-        same = same_uv(a, uv)
-        conn = set()
-        for b in same & frag:
-            conn.add(b.link_loop_next)
-        for c in same:
-            prv = c.link_loop_prev
-            if prv in frag:
-                conn.add(prv)
-        uvs = set([(c.vert,c[uv].uv[:]) for c in conn])
-        if len(uvs) > 2:
+def has_fork(links):
+    for linked in links.values():
+        if len(linked) > 2:
             return True
     return False
 
-def frag_to_chain(frag, uv):
-    if has_fork(frag, uv):
+def order_links(links, index):
+    ends = [k for k in links if len(links[k]) == 1]
+    start = ends[0] if ends else get_any(links)
+    keys = [start]
+    prev = None
+    cur = start
+    while True:
+        nxt = None
+        for k in links[cur]:
+            if k != prev:
+                nxt = k
+                break
+        if nxt is None:
+            break
+        keys.append(nxt)
+        if nxt == start:
+            break
+        prev, cur = cur, nxt
+    is_closed = len(keys) > 2 and keys[0] == keys[-1]
+    return is_closed, [list(index[k]) for k in keys]
+
+def frag_to_chain(frag, uv, index):
+    links = link_uvs(frag, uv)
+    if has_fork(links):
         return None, None
-    return order_links(frag, uv)
+    return order_links(links, index)
 
-def frags_to_chains(frags, uv):
+def frags_to_chains(frags, uv, index):
     result = []
     for a in frags:
-        is_closed, ch = frag_to_chain(a, uv)
+        is_closed, ch = frag_to_chain(a, uv, index)
         if ch:
             result.append((is_closed,ch))
     return result
@@ -283,74 +245,65 @@ def arrange_uv_chain(ch, uv, equalize):
 
 def arrange_uv_chains(bm, equalize):
     uv = bm.loops.layers.uv.active
-    chains = frags_to_chains(partial_frags(bm, uv), uv)
+    frags, index = partial_frags(bm, uv)
+    chains = frags_to_chains(frags, uv, index)
     for ch in chains:
         arrange_uv_chain(ch, uv, equalize)
 
+def angle_signed(a, b):
+    # mathutils.Vector.angle_signed for (n, 2) arrays b
+    return np.arctan2(a[1] * b[:, 0] - a[0] * b[:, 1], b @ a)
+
 def circ_uv_chain(order, uv, equalize):
-    coords = [b[0][uv].uv for b in order]
+    coords = read_uvs([b[0] for b in order], uv)
     n = len(coords)
-    c = mu.Vector((
-        sum([v[0] for v in coords]) / n,
-        sum([v[1] for v in coords]) / n))
-    r = sum([(v-c).magnitude for v in coords]) / n
-    s = (order[0][0][uv].uv - c).normalized()
+    c = coords.mean(axis=0)
+    offs = coords - c
+    r = np.linalg.norm(offs, axis=1).mean()
+    s = offs[0] / (np.linalg.norm(offs[0]) or 1.0)
     if equalize:
         avg = math.radians(360) / (n - 1)
-        if s.angle_signed(coords[1] - c) >= 0:
+        if angle_signed(s, offs[1:2])[0] >= 0:
             avg *= -1
-        angles = [avg*i for i in range(len(coords))]
+        angles = avg * np.arange(n)
     else:
-        angles = []
-        for co in coords:
-            angles.append(-s.angle_signed(co - c))
-    for a, ls in zip(angles, order):
-        co = ((mu.Matrix.Rotation(a, 2)) * s) * r + c
-        for l in ls:
-            l[uv].uv = co
+        angles = -angle_signed(s, offs)
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    rotated = np.stack((cos * s[0] - sin * s[1], sin * s[0] + cos * s[1]), axis=1)
+    write_uv_groups(order, uv, rotated * r + c)
 
 def distrib_uv_chain(order, uv, equalize):
     n = len(order)
-    s = order[0][0][uv].uv.copy()
-    d = order[-1][0][uv].uv - s
-    avg = d.copy() / (n - 1)
+    coords = read_uvs([b[0] for b in order], uv)
+    s = coords[0]
+    d = coords[-1] - s
+    # fraction of d each point but the last is moved to
     if equalize:
-        vecs = [avg] * (n - 1)
+        t = np.arange(n - 1) / (n - 1)
+    elif not d.any():
+        t = np.zeros(n - 1)
     else:
-        dist = d.magnitude
-        if not dist:
-            vecs = [mu.Vector((0.0,0.0))] * (n - 1)
-        else:
-            vecs = []
-            for i in range(n - 1):
-                vecs.append(order[i+1][0][uv].uv - order[i][0][uv].uv)
-            total = sum([a.magnitude for a in vecs])
-            for i in range(len(vecs)):
-                vecs[i] = d * (vecs[i].magnitude / total)
-    for ls, vec in zip(order, vecs):
-        for a in ls:
-            a[uv].uv = s
-        s += vec
+        segs = np.linalg.norm(np.diff(coords, axis=0), axis=1)
+        t = np.concatenate(((0.0,), np.cumsum(segs)[:-1])) / segs.sum()
+    write_uv_groups(order[:-1], uv, s + d * t[:, None])
 
 def xform_uv_frags(mtx, geom, bm):
+    # transforms the snapshot in geom, not the current UVs, so repeated
+    # calls don't accumulate and need no reset in between
     uv = bm.loops.layers.uv.verify()
-    for center, frag in geom:
-        for l in frag:
-            l[uv].uv = center + mtx @ (l[uv].uv - center)
+    ls, co, centers = geom
+    write_uvs(ls, uv, centers + (co - centers) @ np.array(mtx, dtype=np.float32).T)
     return bm
 
-def prep_frags(frags, bm):
-    result = []
-    uv = bm.loops.layers.uv.verify()
-    for frag in frags:
-        uvs = [l[uv].uv[:] for l in frag]
-        min_u = min([a[0] for a in uvs])
-        max_u = max([a[0] for a in uvs])
-        min_v = min([a[1] for a in uvs])
-        max_v = max([a[1] for a in uvs])
-        center = mu.Vector(((min_u + max_u) * 0.5, (min_v + max_v) * 0.5))
-        result.append((center,frag))
-    return result
+def prep_frags(frags, coords):
+    # adds the center of each loop's frag UV bounds to the initial_uvs
+    # snapshot of frags
+    ls, co = coords
+    sizes = [len(frag) for frag in frags]
+    starts = np.cumsum([0] + sizes[:-1])
+    center = (np.minimum.reduceat(co, starts) + np.maximum.reduceat(co, starts)) * 0.5
+    return ls, co, np.repeat(center, sizes, axis=0)
 
 def scale_uv_frags(factor_x, factor_y, frags, bm):
     mtx = mu.Matrix.Scale(factor_x, 2) * mu.Matrix.Scale(factor_y, 2)
@@ -358,29 +311,57 @@ def scale_uv_frags(factor_x, factor_y, frags, bm):
 
 ### Mesh editing tools
 
+def connected_faces(f):
+    piece = set([f])
+    todo = [f]
+    while todo:
+        for v in todo.pop().verts:
+            for lf in v.link_faces:
+                if lf not in piece:
+                    piece.add(lf)
+                    todo.append(lf)
+    return piece
+
 def mirror(bm):
-    copy_lookup = {}
-    orig_faces = bm.faces[:]
-    for f in orig_faces:
+    # every selected face gets a mirrored copy of its connected piece.
+    # copies are made in rounds that duplicate each piece at most once,
+    # then all faces are removed and all copies welded in one go
+    pieces = []
+    todo = {}
+    piece_of = {}
+    for f in bm.faces:
         if f.select:
-            bmcp = bmesh.ops.duplicate(bm, geom=orig_faces)
-            for fcp in bmcp['geom']:
-                if type(fcp) == bmesh.types.BMFace:
-                    fcp.normal_flip()
-            copy_lookup[f] = bmcp
-    for f in copy_lookup:
-        tm = mu.Matrix.Translation(f.calc_center_median())
-        sm = mu.Matrix.Scale(-1.0, 4, f.normal)
-        cp = copy_lookup[f]
-        bmesh.ops.transform(bm,
-            matrix=tm @ sm @ tm.inverted(),
-            verts=[v for v in cp['geom'] if type(v) == bmesh.types.BMVert])
-        weld_map = {}
-        for v in f.verts:
-            vc = cp['vert_map'][v]
-            weld_map[vc] = v
-        bm.faces.remove(cp['face_map'][f])
-        bm.faces.remove(f)
+            if f not in piece_of:
+                piece = connected_faces(f)
+                for pf in piece:
+                    piece_of[pf] = len(pieces)
+                pieces.append(list(piece))
+            todo.setdefault(piece_of[f], []).append(f)
+    remove = []
+    weld_map = {}
+    while todo:
+        batch = [(i, todo[i].pop()) for i in todo]
+        todo = dict([(i, fs) for i, fs in todo.items() if fs])
+        cp = bmesh.ops.duplicate(bm,
+            geom=[pf for i, f in batch for pf in pieces[i]])
+        vert_map = cp['vert_map']
+        face_map = cp['face_map']
+        for fcp in cp['geom']:
+            if type(fcp) == bmesh.types.BMFace:
+                fcp.normal_flip()
+        for i, f in batch:
+            tm = mu.Matrix.Translation(f.calc_center_median())
+            sm = mu.Matrix.Scale(-1.0, 4, f.normal)
+            verts = set([v for pf in pieces[i] for v in pf.verts])
+            bmesh.ops.transform(bm,
+                matrix=tm @ sm @ tm.inverted(),
+                verts=[vert_map[v] for v in verts])
+            for v in f.verts:
+                weld_map[vert_map[v]] = v
+            remove.append(face_map[f])
+            remove.append(f)
+    if remove:
+        bmesh.ops.delete(bm, geom=remove, context='FACES_ONLY')
         bmesh.ops.weld_verts(bm, targetmap=weld_map)
 
 def put_on(to, at, bm, turn):
@@ -475,6 +456,7 @@ def entire_loop(edge):
     e = edge
     v = edge.verts[0]
     loop = [edge]
+    back = []
     going_forward = True
     while True:
         ext = loop_extension(e, v)
@@ -485,7 +467,7 @@ def entire_loop(edge):
                 else: # continue forward
                     loop.append(ext)
             else: # continue backward
-                loop.insert(0, ext)
+                back.append(ext)
             v = ext.other_vert(v)
             e = ext
         else: # finite and we've reached an end
@@ -494,7 +476,8 @@ def entire_loop(edge):
                 e = edge
                 v = edge.verts[1]
             else: # the other end
-                return loop
+                back.reverse()
+                return back + loop
 
 def partial_ring(edge, face):
     part_ring = []
@@ -520,23 +503,35 @@ def entire_ring(edge):
         dirs = [ne for ne in [partial_ring(edge, f) for f in fs] if ne]
         if dirs:
             if len(dirs) == 2 and set(dirs[0]) != set(dirs[1]):
-                [ring.insert(0, e) for e in dirs[1]]
+                ring = dirs[1][::-1] + ring
             ring.extend(dirs[0])
     return ring
 
-def complete_associated_loops(edges):
-    loops = []
+def index_walks(edges, walk):
+    # walks the loop or ring (entire_loop/entire_ring) of each of edges
+    # that isn't on an earlier walk. returns the walks, in order, and
+    # edge -> id of the first walk it's on
+    walks = []
+    walk_ids = {}
     for e in edges:
-        if not any([e in l for l in loops]):
-            loops.append(entire_loop(e))
-    return loops
+        if e in walk_ids:
+            continue
+        w = walk(e)
+        for x in w:
+            walk_ids.setdefault(x, len(walks))
+        walks.append(w)
+    return walks, walk_ids
+
+def complete_associated_loops(edges):
+    return index_walks(edges, entire_loop)[0]
 
 def complete_associated_rings(edges):
-    rings = []
-    for e in edges:
-        if not any([e in r for r in rings]):
-            rings.append(entire_ring(e))
-    return rings
+    return index_walks(edges, entire_ring)[0]
+
+def walk_tails(walk, gaps):
+    # the gaps touching either end of a finite walk. only the end edges of
+    # entire_loop/entire_ring can be a loop_end/ring_end
+    return [g for g in gaps if g[0] == walk[0] or g[-1] == walk[-1]]
 
 def grow_loop(context):
     mesh = context.active_object.data
@@ -628,8 +623,7 @@ def select_bounded_loop(context):
             else:
                 final_gaps = sg
         else: # loop is finite
-            tails = [g for g in gaps
-                if any(map(lambda x: loop_end(x), g))]
+            tails = walk_tails(l, gaps)
             nontails = [g for g in gaps if g not in tails]
             if nontails:
                 final_gaps = nontails
@@ -658,8 +652,7 @@ def select_bounded_ring(context):
             else:
                 final_gaps = sg
         else: # ring is finite
-            tails = [g for g in gaps
-                if any(map(lambda x: ring_end(x), g))]
+            tails = walk_tails(r, gaps)
             nontails = [g for g in gaps if g not in tails]
             if nontails:
                 final_gaps = nontails
@@ -730,75 +723,86 @@ def vert_chains(frags):
             chains.append((is_closed, chain))
     return chains
 
+def normalized(v):
+    length = np.linalg.norm(v, axis=1)[:, None]
+    return np.divide(v, length, out=np.zeros_like(v), where=length > 0)
+
+def chain_arrays(chains):
+    # all chains flattened into one vert list. per chain its length and
+    # start, per vert its chain id and position in the chain
+    vs = [v for ch in chains for v in ch]
+    lens = np.array([len(ch) for ch in chains])
+    starts = np.concatenate(((0,), np.cumsum(lens)[:-1]))
+    ids = np.repeat(np.arange(len(chains)), lens)
+    pos = np.arange(len(vs)) - starts[ids]
+    co = np.array([v.co[:] for v in vs], dtype=np.float64).reshape(-1, 3)
+    return vs, co, (lens, starts, ids, pos)
+
+def chain_fractions(co, chains):
+    # per vert, how far along its chain's length it is, 0.0 to 1.0
+    lens, starts, ids, pos = chains
+    segs = np.zeros(len(co))
+    segs[1:] = np.linalg.norm(np.diff(co, axis=0), axis=1)
+    segs[starts] = 0.0
+    along = np.cumsum(segs)
+    along -= along[starts][ids]
+    total = along[starts + lens - 1][ids]
+    return np.divide(along, total, out=np.zeros_like(along), where=total > 0)
+
 def arrange_edges(context, equalize):
     mesh = context.active_object.data
     bm = bmesh.from_edit_mesh(mesh)
     frags = mesh_frags(bm)
+    closed = []
+    opened = []
     for is_closed, chain in vert_chains(frags):
         if is_closed:
-            circularize(chain, equalize)
+            closed.append(chain)
         else:
-            string_along(chain, equalize)
+            opened.append(chain)
+    for chains, arrange in ((closed, circularize), (opened, string_along)):
+        if chains:
+            vs, co, layout = chain_arrays(chains)
+            for v, xyz in zip(vs, arrange(co, layout, equalize).tolist()):
+                v.co = xyz
     context.active_object.data.update()
     return {'FINISHED'}
 
-def circularize(ovs, equalize):
-    n = len(ovs)
-    center = mu.Vector((
-        sum([v.co[0] for v in ovs]) / n,
-        sum([v.co[1] for v in ovs]) / n,
-        sum([v.co[2] for v in ovs]) / n))
-    dists = [(v.co - center).magnitude for v in ovs]
-    avg_d = (max(dists) + min(dists)) * 0.5
-    crosses = []
-    for v in ovs:
-        pv = ovs[ovs.index(v)-1]
-        crosses.append((pv.co - center).cross(v.co - center))
-    nrm = mu.Vector((
-        sum([a[0] for a in crosses]) / n,
-        sum([a[1] for a in crosses]) / n,
-        sum([a[2] for a in crosses]) / n)).normalized()
-    nrm2 = nrm.cross(ovs[0].co - center)
-    offset = -nrm.cross(nrm2)
-    offset.magnitude = avg_d
+def circularize(co, chains, equalize):
+    # closed chains end on their first vert again
+    lens, starts, ids, pos = chains
+    center = np.add.reduceat(co, starts) / lens[:, None]
+    offs = co - center[ids]
+    dists = np.linalg.norm(offs, axis=1)
+    avg_d = (np.maximum.reduceat(dists, starts) + np.minimum.reduceat(dists, starts)) * 0.5
+    # each vert crossed with the one before it. the first vert (and so
+    # its repeat at the end) pairs with itself
+    crosses = np.zeros_like(co)
+    crosses[1:] = np.cross(offs[:-1], offs[1:])
+    crosses[starts] = 0.0
+    crosses[starts + lens - 1] = 0.0
+    nrm = normalized(np.add.reduceat(crosses, starts))
+    offset = -np.cross(nrm, np.cross(nrm, offs[starts]))
+    offset = normalized(offset) * avg_d[:, None]
     doublepi = 6.283185307179586
     if equalize:
-        quats = [mu.Quaternion(nrm, doublepi / (n - 1))] * n
+        angles = doublepi * pos / (lens - 1)[ids]
     else:
-        if not avg_d:
-            quats = [mu.Quaternion((1.0, 0.0, 0.0, 0.0))] * n
-        else:
-            vecs = [ovs[i+1].co - ovs[i].co for i in range(n - 1)]
-            total = sum([vec.magnitude for vec in vecs])
-            quats = []
-            for vec in vecs:
-                a = doublepi * (vec.magnitude / total)
-                quats.append(mu.Quaternion(nrm, a))
-    for v, quat in zip(ovs, quats):
-        v.co = center + offset
-        offset.rotate(quat)
-
-def string_along(ovs, equalize):
-    n = len(ovs)
-    s = ovs[0].co.copy()
-    d = ovs[-1].co - s
-    avg = d / (n - 1)
+        angles = doublepi * chain_fractions(co, chains)
+    # offset is perpendicular to nrm, rotate it in the plane around nrm
+    side = np.cross(nrm, offset)[ids]
+    return (center[ids] + offset[ids] * np.cos(angles)[:, None] +
+        side * np.sin(angles)[:, None])
+
+def string_along(co, chains, equalize):
+    lens, starts, ids, pos = chains
+    s = co[starts][ids]
+    d = co[starts + lens - 1][ids] - s
     if equalize:
-        vecs = [avg] * n
+        t = pos / (lens - 1)[ids]
     else:
-        dist = d.magnitude
-        if not dist:
-            vecs = [mu.Vector((0.0,0.0,0.0))] * (n - 1)
-        else:
-            vecs = []
-            for i in range(n - 1):
-                vecs.append(ovs[i+1].co - ovs[i].co)
-            total = sum([a.magnitude for a in vecs])
-            for i in range(len(vecs)):
-                vecs[i] = d * (vecs[i].magnitude / total)
-    for v, vec in zip(ovs, vecs):
-        v.co = s
-        s += vec
+        t = chain_fractions(co, chains)
+    return s + d * t[:, None]
 
 class GrowLoop(bpy.types.Operator):
     bl_idname = "mesh.z_grow_loop"
@@ -1057,7 +1061,7 @@ class RotateUVFragments(bpy.types.Operator):
 
     def modal(self, context, event):
         if event.type in {'ESC', 'RIGHTMOUSE'} and event.value == 'PRESS':
-            reset_uvs(context, self.initial_uvs)
+            reset_uvs(context, self.initial_uvs, self.bm)
             return {'CANCELLED'}
         elif event.type == 'MOUSEMOVE':
             mult = math.radians(1)
@@ -1077,16 +1081,16 @@ class RotateUVFragments(bpy.types.Operator):
             self.initial_pos = event.mouse_y
             bm = bmesh.from_edit_mesh(context.active_object.data)
             frags = detect_uv_frags(bm)
-            self.initial_uvs = initial_uvs(frags, bm)
             if frags:
+                # held for the whole drag, every event only writes UVs
                 self.bm = bm
-                self.geom = prep_frags(frags, bm)
+                self.initial_uvs = initial_uvs(frags, bm)
+                self.geom = prep_frags(frags, self.initial_uvs)
                 context.window_manager.modal_handler_add(self)
                 return {'RUNNING_MODAL'}
         return {'CANCELLED'}
 
     def execute(self, context):
-        reset_uvs(context, self.initial_uvs)
         mtx = mu.Matrix.Rotation(math.radians(self.angle), 2)
         xform_uv_frags(mtx, self.geom, self.bm)
         bmesh.update_edit_mesh(context.active_object.data)
@@ -1118,7 +1122,7 @@ class ScaleUVFragments(bpy.types.Operator):
 
     def modal(self, context, event):
         if event.type in {'ESC', 'RIGHTMOUSE'} and event.value == 'PRESS':
-            reset_uvs(context, self.initial_uvs)
+            reset_uvs(context, self.initial_uvs, self.bm)
             return {'CANCELLED'}
         elif event.type == 'MOUSEMOVE':
             mult = 0.1
@@ -1130,11 +1134,11 @@ class ScaleUVFragments(bpy.types.Operator):
             self.execute(context)
         elif event.type in {'X','U'} and event.value == 'RELEASE':
             self.axis = 'UV' if self.axis == 'U' else 'U'
-            reset_uvs(context, self.initial_uvs)
+            reset_uvs(context, self.initial_uvs, self.bm)
             self.initial_pos = event.mouse_y
         elif event.type in {'Y','V'} and event.value == 'RELEASE':
             self.axis = 'UV' if self.axis == 'V' else 'V'
-            reset_uvs(context, self.initial_uvs)
+            reset_uvs(context, self.initial_uvs, self.bm)
             self.initial_pos = event.mouse_y
         elif event.type in {'RET', 'LEFTMOUSE'}:
             return {'FINISHED'}
@@ -1145,16 +1149,15 @@ class ScaleUVFragments(bpy.types.Operator):
             self.initial_pos = event.mouse_y
             bm = bmesh.from_edit_mesh(context.active_object.data)
             frags = detect_uv_frags(bm)
-            self.initial_uvs = initial_uvs(frags, bm)
             if frags:
                 self.bm = bm
-                self.geom = prep_frags(frags, bm)
+                self.initial_uvs = initial_uvs(frags, bm)
+                self.geom = prep_frags(frags, self.initial_uvs)
                 context.window_manager.modal_handler_add(self)
                 return {'RUNNING_MODAL'}
         return {'CANCELLED'}
 
     def execute(self, context):
-        reset_uvs(context, self.initial_uvs)
         if self.axis == 'U':
             mtx = mu.Matrix.Scale(self.factor, 2, mu.Vector((1.0,0.0)))
         elif self.axis == 'V':